@@ -6,6 +6,7 @@ import tempfile
 import os
 import sys
 import time
+import logging
 from datetime import datetime
 
 # Add project root to sys.path
@@ -24,9 +25,10 @@ from src.modules.database import (
 )
 from src.modules.report import generate_pdf
 from src.modules.ecg_processor import (
-    load_model, generate_advanced_ecg, calculate_metrics, 
-    predict_risk, compute_saliency
+    load_model, start_model_loading, model_status, generate_advanced_ecg, get_analysis_context,
+    predict_risk
 )
+from src.preprocessing.resampling import MODEL_FS, ingest
 
 # --- Icons URLs (Flat Style) ---
 ICON_HEART = "https://cdn-icons-png.flaticon.com/512/2966/2966486.png" 
@@ -40,6 +42,10 @@ ICON_EDIT = "https://cdn-icons-png.flaticon.com/512/1159/1159633.png"
 
 # --- Setup ---
 setup_page()
+# Model load times go to the server log
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+# Load + warm up the model in the background as soon as the server starts (no-op on reruns)
+start_model_loading()
 
 # --- Helper: Custom Alerts ---
 def display_alert(type, message):
@@ -79,6 +85,8 @@ def init_session():
         st.session_state['current_signal'] = None
     if 'current_time' not in st.session_state:
         st.session_state['current_time'] = None
+    if 'current_fs' not in st.session_state:
+        st.session_state['current_fs'] = MODEL_FS
     if 'analysis_done' not in st.session_state:
         st.session_state['analysis_done'] = False
     if 'last_uploaded_file' not in st.session_state:
@@ -321,26 +329,30 @@ def patient_profile_view(cnp):
                 sensitivity = 1.0
 
                 if st.button("Generate Signal", type="primary", use_container_width=True):
-                    signal, time_axis = generate_advanced_ecg(heart_rate, noise_level, st_disp, t_amp)
+                    signal, time_axis = generate_advanced_ecg(heart_rate=heart_rate, noise_level=noise_level,
+                                                              st_displacement=st_disp, t_amplitude=t_amp)
                     st.session_state['current_signal'] = signal
                     st.session_state['current_time'] = time_axis
+                    st.session_state['current_fs'] = MODEL_FS
                     st.session_state['analysis_done'] = False # Reset analysis
                     st.rerun()
             else:
                 uploaded_file = st.file_uploader("Upload CSV", type=["csv"])
+                upload_fs = st.selectbox("Sampling Rate (Hz)", [100, 250, 500, 1000], index=2)
                 sensitivity = 1.0
                 if uploaded_file:
-                    # Check if file changed
-                    if st.session_state.get('last_uploaded_file') != uploaded_file.name:
+                    # Check if file (or its declared rate) changed
+                    if st.session_state.get('last_uploaded_file') != (uploaded_file.name, upload_fs):
                         try:
                             uploaded_file.seek(0) # Reset pointer
                             df = pd.read_csv(uploaded_file)
-                            signal = df.iloc[:, :12].values
-                            if len(signal) > 5000: signal = signal[:5000]
-                            st.session_state['current_signal'] = signal
-                            st.session_state['current_time'] = np.linspace(0, len(signal)/500, len(signal))
+                            # Resampled to the model's rate once, here; first 10s only
+                            ecg = ingest(df.iloc[:, :12].values, upload_fs).truncated(10)
+                            st.session_state['current_signal'] = ecg.data
+                            st.session_state['current_time'] = ecg.time_axis()
+                            st.session_state['current_fs'] = ecg.fs
                             st.session_state['analysis_done'] = False
-                            st.session_state['last_uploaded_file'] = uploaded_file.name
+                            st.session_state['last_uploaded_file'] = (uploaded_file.name, upload_fs)
                         except Exception as e: 
                             st.error(f"Invalid CSV: {e}")
 
@@ -348,6 +360,7 @@ def patient_profile_view(cnp):
             if st.session_state['current_signal'] is not None:
                 signal = st.session_state['current_signal']
                 t = st.session_state['current_time']
+                fs = st.session_state['current_fs']
                 
                 # Plot
                 fig, ax = plt.subplots(figsize=(8, 2.5))
@@ -364,16 +377,21 @@ def patient_profile_view(cnp):
                 st.pyplot(fig)
                 
                 # Diagnosis
+                status = model_status()
+                if status['loading']:
+                    st.caption("⏳ AI model is loading...")
+                elif status['error']:
+                    st.caption(f"⚠️ AI model unavailable: {status['error']}")
                 if st.button("Run AI Diagnosis", type="primary", use_container_width=True):
                     model = load_model()
                     if model:
                         with st.spinner("Analyzing..."):
-                            risk = predict_risk(model, signal, sensitivity)
+                            risk = predict_risk(model, signal, sensitivity, fs)
                             st.session_state['risk_score'] = risk
                             st.session_state['analysis_done'] = True
                             
-                            # Save to DB
-                            bpm, _ = calculate_metrics(signal)
+                            # Save to DB (metrics are memoized per signal)
+                            bpm, _ = get_analysis_context(signal, fs).metrics
                             diag = "High Risk" if risk > 0.5 else "Low Risk"
                             save_patient_record(cnp, bpm, risk, diag, st.session_state['doctor_data']['full_name'])
                             st.toast("Diagnosis saved to history!", icon="💾")
@@ -381,7 +399,7 @@ def patient_profile_view(cnp):
 
                 if st.session_state.get('analysis_done'):
                     score = st.session_state.get('risk_score', 0)
-                    bpm, hrv = calculate_metrics(signal)
+                    bpm, hrv = get_analysis_context(signal, fs).metrics
                     
                     # Calculate Confidence
                     confidence = abs(score - 0.5) * 2
@@ -0,0 +1,246 @@
+import sys
+import os
+
+# Add project root to sys.path to allow imports from src
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import argparse
+import copy
+import json
+import time
+import numpy as np
+import torch
+import torch.nn.functional as F
+import torch.optim as optim
+from torch.utils.data import Dataset, DataLoader
+
+from src.neural_network.dataset import ECGDataset, ECGSubset
+from src.neural_network.student import StudentCNN
+from src.neural_network.runtime import artifact_paths, load_backend
+from src.export_model import latency
+from src.evaluate_model import score_report
+
+MODEL_PATH = os.path.join(project_root, 'src', 'neural_network', 'saved_model.pth')
+
+# Distillation hyperparameters
+TEMPERATURE = 2.0 # Softens teacher and student logits for the soft-target loss
+ALPHA = 0.3 # Weight of the hard-label loss; 1 - ALPHA goes to matching the teacher
+EPOCHS = 30
+BATCH_SIZE = 64
+LEARNING_RATE = 1e-3
+PATIENCE = 5
+# Student probabilities inside this band are escalated to the full model
+TRIAGE_BAND = (0.2, 0.8)
+
+class TeacherTargets(Dataset):
+    """
+    ECGSubset items extended with the teacher's logit for the same record.
+    """
+    def __init__(self, subset, teacher_logits):
+        self.subset = subset
+        self.teacher_logits = teacher_logits
+
+    def __len__(self):
+        return len(self.subset)
+
+    def __getitem__(self, idx):
+        signal, label = self.subset[idx]
+        return signal, label, self.teacher_logits[idx]
+
+def _splits(dataset):
+    # Same split as train_model: first 80% train, rest validation
+    train_size = int(0.8 * len(dataset))
+    indices = list(range(len(dataset)))
+    return indices[:train_size], indices[train_size:]
+
+def teacher_logits(teacher, subset, batch_size=BATCH_SIZE):
+    """
+    The teacher's logits for every record of `subset`, computed once up front
+    (the teacher is never run inside the training loop).
+    """
+    loader = DataLoader(subset, batch_size=batch_size, shuffle=False)
+    logits = []
+    with torch.inference_mode():
+        for signals, _ in loader:
+            logits.append(teacher(signals, return_logits=True).squeeze(1).float())
+    return torch.cat(logits)
+
+def distillation_loss(student_logits, teacher_logits, labels, temperature=TEMPERATURE, alpha=ALPHA):
+    """
+    alpha * BCE(labels) + (1 - alpha) * T^2 * BCE against the teacher's softened probabilities.
+    """
+    soft_targets = torch.sigmoid(teacher_logits / temperature)
+    soft = F.binary_cross_entropy_with_logits(student_logits / temperature, soft_targets) * temperature ** 2
+    hard = F.binary_cross_entropy_with_logits(student_logits, labels)
+    return alpha * hard + (1 - alpha) * soft
+
+def distill(weights_path=MODEL_PATH, epochs=EPOCHS, batch_size=BATCH_SIZE, learning_rate=LEARNING_RATE,
+            temperature=TEMPERATURE, alpha=ALPHA, patience=PATIENCE, seed=0):
+    """
+    Trains StudentCNN on X_data.npy against saved_model.pth's soft outputs and
+    writes the best (lowest validation loss) weights to saved_model.student.pth.
+    """
+    if not os.path.exists(weights_path):
+        print("Model file not found. Train the model first.")
+        return None
+    processed_dir = os.path.join(project_root, 'data', 'processed')
+    data_path = os.path.join(processed_dir, 'X_data.npy')
+    if not os.path.exists(data_path):
+        print("Data not found. Please run src/preprocessing/prepare_dataset.py first.")
+        return None
+
+    torch.manual_seed(seed)
+    dataset = ECGDataset(data_path, os.path.join(processed_dir, 'y_labels.pkl'))
+    train_indices, val_indices = _splits(dataset)
+    train_subset, val_subset = ECGSubset(dataset, train_indices), ECGSubset(dataset, val_indices)
+
+    teacher = load_backend('eager', weights_path)
+    print(f"Scoring {len(dataset)} records with the teacher...")
+    start = time.perf_counter()
+    train_set = TeacherTargets(train_subset, teacher_logits(teacher, train_subset))
+    val_set = TeacherTargets(val_subset, teacher_logits(teacher, val_subset))
+    print(f"Teacher outputs ready in {time.perf_counter() - start:.1f}s")
+
+    generator = torch.Generator().manual_seed(seed)
+    train_loader = DataLoader(train_set, batch_size=batch_size, shuffle=True, generator=generator)
+    val_loader = DataLoader(val_set, batch_size=batch_size, shuffle=False)
+
+    student = StudentCNN(input_channels=12, num_classes=1)
+    optimizer = optim.AdamW(student.parameters(), lr=learning_rate, weight_decay=1e-4)
+    scheduler = optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=epochs)
+
+    best_val_loss = float('inf')
+    best_state = None
+    patience_counter = 0
+    for epoch in range(epochs):
+        student.train()
+        train_loss = 0.0
+        for signals, labels, soft in train_loader:
+            optimizer.zero_grad()
+            logits = student(signals, return_logits=True).squeeze(1)
+            loss = distillation_loss(logits, soft, labels, temperature, alpha)
+            loss.backward()
+            optimizer.step()
+            train_loss += loss.item() * len(signals)
+        scheduler.step()
+
+        student.eval()
+        val_loss = 0.0
+        with torch.inference_mode():
+            for signals, labels, soft in val_loader:
+                logits = student(signals, return_logits=True).squeeze(1)
+                val_loss += distillation_loss(logits, soft, labels, temperature, alpha).item() * len(signals)
+        train_loss /= max(1, len(train_set))
+        val_loss /= max(1, len(val_set))
+        print(f"Epoch {epoch + 1}/{epochs} - train loss: {train_loss:.4f}, val loss: {val_loss:.4f}")
+
+        if val_loss < best_val_loss:
+            best_val_loss = val_loss
+            best_state = copy.deepcopy(student.state_dict())
+            patience_counter = 0
+        else:
+            patience_counter += 1
+            if patience_counter >= patience:
+                print("Early stopping triggered.")
+                break
+
+    path = artifact_paths(weights_path)['student']
+    torch.save(best_state, path)
+    print(f"Student written to {path} (best val loss {best_val_loss:.4f})")
+    return path
+
+def _predict(model, loader):
+    probs = []
+    with torch.inference_mode():
+        for signals, _ in loader:
+            probs.append(model(signals).squeeze(1).double().numpy())
+    return np.concatenate(probs)
+
+def benchmark(weights_path=MODEL_PATH, band=TRIAGE_BAND, eval_samples=None, batch_size=32):
+    """
+    Student vs teacher on the validation split: latency and speedup, AUC against
+    the labels, agreement with (and AUC against) the teacher's decisions, and how a
+    student-first triage that escalates the `band` to the teacher would behave.
+    """
+    processed_dir = os.path.join(project_root, 'data', 'processed')
+    dataset = ECGDataset(os.path.join(processed_dir, 'X_data.npy'), os.path.join(processed_dir, 'y_labels.pkl'))
+    _, val_indices = _splits(dataset)
+    if len(val_indices) == 0:
+        val_indices = list(range(len(dataset)))
+    val_indices = val_indices[:eval_samples]
+    loader = DataLoader(ECGSubset(dataset, val_indices), batch_size=batch_size, shuffle=False)
+    labels = dataset.y[val_indices].numpy()
+
+    teacher = load_backend('eager', weights_path)
+    student = load_backend('student', weights_path)
+    teacher_probs, student_probs = _predict(teacher, loader), _predict(student, loader)
+    teacher_report, _ = score_report(labels, teacher_probs)
+    student_report, _ = score_report(labels, student_probs)
+    teacher_decisions = (teacher_probs >= 0.5).astype(np.float64)
+    vs_teacher, _ = score_report(teacher_decisions, student_probs)
+
+    # Triage: the student answers outside the band, the teacher inside it
+    escalated = (student_probs >= band[0]) & (student_probs <= band[1])
+    triage_probs = np.where(escalated, teacher_probs, student_probs)
+    triage_report, _ = score_report(labels, triage_probs)
+
+    shape = (1,) + tuple(dataset[0][0].shape)
+    batch_shape = (batch_size,) + shape[1:]
+    report = {
+        'eval_records': int(len(val_indices)),
+        'parameters': {'teacher': sum(p.numel() for p in teacher.parameters()),
+                       'student': sum(p.numel() for p in student.parameters())},
+        'latency_ms': {'teacher': latency(teacher, shape), 'student': latency(student, shape)},
+        'batch_latency_ms': {'teacher': latency(teacher, batch_shape, repeats=5),
+                             'student': latency(student, batch_shape, repeats=5)},
+        'roc_auc': {'teacher': teacher_report['roc_auc'], 'student': student_report['roc_auc'],
+                    'triage': triage_report['roc_auc']},
+        'accuracy': {'teacher': teacher_report['at_threshold']['accuracy'],
+                     'student': student_report['at_threshold']['accuracy'],
+                     'triage': triage_report['at_threshold']['accuracy']},
+        'agreement': float(np.mean((student_probs >= 0.5) == teacher_decisions)),
+        'auc_vs_teacher': vs_teacher['roc_auc'],
+        'mean_abs_prob_diff': float(np.abs(student_probs - teacher_probs).mean()),
+        'triage_band': list(band),
+        'escalation_rate': float(escalated.mean()),
+        'triage_agreement': float(np.mean((triage_probs >= 0.5) == teacher_decisions)),
+    }
+    report['speedup'] = report['latency_ms']['teacher'] / report['latency_ms']['student']
+    report['batch_speedup'] = report['batch_latency_ms']['teacher'] / report['batch_latency_ms']['student']
+
+    def fmt(v):
+        if v is None:
+            return f"{'n/a':>10}"
+        return f"{v:10d}" if isinstance(v, int) else f"{v:10.4f}"
+    print(f"\n{'':<18}{'teacher':>10}{'student':>10}")
+    for key in ('parameters', 'latency_ms', 'batch_latency_ms', 'roc_auc', 'accuracy'):
+        print(f"{key:<18}{fmt(report[key]['teacher'])}{fmt(report[key]['student'])}")
+    print(f"Speedup: {report['speedup']:.1f}x (single), {report['batch_speedup']:.1f}x (batch {batch_size})")
+    print(f"Agreement with teacher: {100 * report['agreement']:.1f}%, AUC vs teacher decisions: "
+          f"{fmt(report['auc_vs_teacher']).strip()}")
+    print(f"Triage {band}: {100 * report['escalation_rate']:.1f}% escalated, "
+          f"agreement {100 * report['triage_agreement']:.1f}%, AUC {fmt(report['roc_auc']['triage']).strip()}")
+
+    report_path = os.path.splitext(artifact_paths(weights_path)['student'])[0] + '.json'
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distill saved_model.pth into the compact triage student.")
+    parser.add_argument("--weights", default=MODEL_PATH, help="Teacher state dict")
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--lr", type=float, default=LEARNING_RATE)
+    parser.add_argument("--temperature", type=float, default=TEMPERATURE)
+    parser.add_argument("--alpha", type=float, default=ALPHA, help="Weight of the hard-label loss")
+    parser.add_argument("--benchmark-only", action="store_true", help="Skip training, benchmark the saved student")
+    parser.add_argument("--eval-samples", type=int, default=None, help="Limit the benchmark to N validation records")
+    args = parser.parse_args()
+
+    if args.benchmark_only or distill(args.weights, epochs=args.epochs, batch_size=args.batch_size,
+                                      learning_rate=args.lr, temperature=args.temperature, alpha=args.alpha):
+        benchmark(args.weights, eval_samples=args.eval_samples)
@@ -1,8 +1,13 @@
 import torch
 import numpy as np
 import os
+import argparse
+import json
+import time
+import matplotlib
+matplotlib.use('Agg')  # Headless: plots go to files
 import matplotlib.pyplot as plt
-from sklearn.metrics import classification_report, confusion_matrix, ConfusionMatrixDisplay
+from sklearn.metrics import classification_report, ConfusionMatrixDisplay
 from torch.utils.data import DataLoader
 
 # Add project root to sys.path
@@ -13,15 +18,192 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 from src.neural_network.dataset import ECGDataset
-from src.neural_network.model import CNNLSTM
+from src.neural_network.runtime import load_backend
+from src.modules.profiling import Profiler
 
-def evaluate():
+CALIBRATION_BINS = 10
+TARGET_NAMES = ['Normal/Other', 'MI']
+
+def binary_curves(y_true, scores):
+    """
+    ROC and precision-recall curves over every distinct threshold, from one sort.
+
+    Returns a dict of arrays (thresholds descending) with tp/fp counts,
+    tpr/fpr, precision and recall; tpr/fpr start at (0, 0).
+    """
+    y_true = np.asarray(y_true, dtype=np.float64)
+    scores = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(-scores, kind='mergesort')
+    scores, y_true = scores[order], y_true[order]
+
+    # Last index of each run of equal scores: one point per distinct threshold
+    last = np.r_[np.flatnonzero(np.diff(scores)), len(scores) - 1]
+    tps = np.cumsum(y_true)[last]
+    fps = (last + 1) - tps
+    positives, negatives = tps[-1], fps[-1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tpr = tps / positives if positives > 0 else np.full(len(tps), np.nan)
+        fpr = fps / negatives if negatives > 0 else np.full(len(fps), np.nan)
+        precision = tps / (tps + fps)
+    return {
+        'thresholds': scores[last],
+        'tps': tps,
+        'fps': fps,
+        'positives': positives,
+        'negatives': negatives,
+        'tpr': np.r_[0.0, tpr],
+        'fpr': np.r_[0.0, fpr],
+        'precision': precision,
+        'recall': tpr,
+    }
+
+def threshold_table(curves):
+    """
+    Confusion counts and F1 / specificity / Youden's J at every threshold.
+    """
+    tp, fp = curves['tps'], curves['fps']
+    fn = curves['positives'] - tp
+    tn = curves['negatives'] - fp
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f1 = 2 * tp / (2 * tp + fp + fn)
+        specificity = tn / (tn + fp)
+    return {
+        'thresholds': curves['thresholds'],
+        'f1': np.nan_to_num(f1),
+        'specificity': np.nan_to_num(specificity),
+        'youden': np.nan_to_num(curves['tpr'][1:] - curves['fpr'][1:]),
+    }
+
+def metrics_at(y_true, scores, threshold):
+    pred = scores >= threshold
+    positive = y_true > 0.5
+    tp = int(np.sum(pred & positive))
+    fp = int(np.sum(pred & ~positive))
+    fn = int(np.sum(~pred & positive))
+    tn = int(np.sum(~pred & ~positive))
+    return {
+        'threshold': float(threshold),
+        'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn,
+        'accuracy': (tp + tn) / max(len(pred), 1),
+        'precision': tp / (tp + fp) if tp + fp else 0.0,
+        'recall': tp / (tp + fn) if tp + fn else 0.0,
+        'specificity': tn / (tn + fp) if tn + fp else 0.0,
+        'f1': 2 * tp / (2 * tp + fp + fn) if tp else 0.0,
+    }
+
+def calibration(y_true, scores, n_bins=CALIBRATION_BINS):
+    """
+    Reliability table (equal-width bins), expected calibration error and Brier score.
+    """
+    bins = np.minimum((scores * n_bins).astype(int), n_bins - 1)
+    counts = np.bincount(bins, minlength=n_bins)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_pred = np.bincount(bins, weights=scores, minlength=n_bins) / counts
+        frac_pos = np.bincount(bins, weights=y_true, minlength=n_bins) / counts
+    filled = counts > 0
+    ece = float(np.sum(counts[filled] / len(scores) * np.abs(mean_pred[filled] - frac_pos[filled])))
+    return {
+        'bins': n_bins,
+        'counts': counts.tolist(),
+        # Empty bins are None (JSON null)
+        'mean_predicted': [float(v) if f else None for v, f in zip(mean_pred, filled)],
+        'fraction_positive': [float(v) if f else None for v, f in zip(frac_pos, filled)],
+        'ece': ece,
+        'brier': float(np.mean((scores - y_true) ** 2)),
+    }
+
+def score_report(y_true, scores, threshold=0.5):
+    """
+    All threshold-free and thresholded metrics for one scorer.
+    AUCs are None when only one class is present.
+    """
+    curves = binary_curves(y_true, scores)
+    table = threshold_table(curves)
+    both_classes = curves['positives'] > 0 and curves['negatives'] > 0
+
+    report = {
+        'n': int(len(scores)),
+        'positives': int(curves['positives']),
+        'roc_auc': float(np.trapezoid(curves['tpr'], curves['fpr'])) if both_classes else None,
+        # Average precision: precision weighted by each recall step
+        'average_precision': float(np.sum(np.diff(np.r_[0.0, curves['recall']]) * curves['precision']))
+                             if curves['positives'] > 0 else None,
+        'calibration': calibration(y_true, scores),
+        'at_threshold': metrics_at(y_true, scores, threshold),
+    }
+    if both_classes:
+        report['best_f1'] = metrics_at(y_true, scores, table['thresholds'][np.argmax(table['f1'])])
+        report['best_youden'] = metrics_at(y_true, scores, table['thresholds'][np.argmax(table['youden'])])
+    return report, curves
+
+def save_plots(name, y_true, scores, report, curves, output_dir):
+    """
+    ROC, precision-recall, reliability and confusion-matrix PNGs for one scorer.
+    """
+    paths = []
+    if report['roc_auc'] is not None:
+        fig, ax = plt.subplots(figsize=(6, 6))
+        ax.plot(curves['fpr'], curves['tpr'], label=f"AUC = {report['roc_auc']:.3f}")
+        ax.plot([0, 1], [0, 1], 'k--', linewidth=0.8)
+        ax.set(xlabel='False positive rate', ylabel='True positive rate', title=f'ROC ({name})')
+        ax.legend(loc='lower right')
+        paths.append(os.path.join(output_dir, f'{name}_roc.png'))
+        fig.savefig(paths[-1], dpi=120, bbox_inches='tight')
+        plt.close(fig)
+
+    if report['average_precision'] is not None:
+        fig, ax = plt.subplots(figsize=(6, 6))
+        ax.plot(curves['recall'], curves['precision'], label=f"AP = {report['average_precision']:.3f}")
+        ax.set(xlabel='Recall', ylabel='Precision', title=f'Precision-Recall ({name})', xlim=(0, 1), ylim=(0, 1.05))
+        ax.legend(loc='lower left')
+        paths.append(os.path.join(output_dir, f'{name}_pr.png'))
+        fig.savefig(paths[-1], dpi=120, bbox_inches='tight')
+        plt.close(fig)
+
+    cal = report['calibration']
+    fig, ax = plt.subplots(figsize=(6, 6))
+    ax.plot([0, 1], [0, 1], 'k--', linewidth=0.8)
+    filled = [i for i, c in enumerate(cal['counts']) if c > 0]
+    ax.plot([cal['mean_predicted'][i] for i in filled], [cal['fraction_positive'][i] for i in filled], 'o-', label=f"ECE = {cal['ece']:.3f}")
+    ax.set(xlabel='Mean predicted probability', ylabel='Fraction positive', title=f'Calibration ({name})',
+           xlim=(0, 1), ylim=(0, 1))
+    ax.legend(loc='upper left')
+    paths.append(os.path.join(output_dir, f'{name}_calibration.png'))
+    fig.savefig(paths[-1], dpi=120, bbox_inches='tight')
+    plt.close(fig)
+
+    m = report['at_threshold']
+    cm = np.array([[m['tn'], m['fp']], [m['fn'], m['tp']]])
+    disp = ConfusionMatrixDisplay(confusion_matrix=cm, display_labels=TARGET_NAMES)
+    disp.plot(cmap=plt.cm.Blues)
+    disp.ax_.set_title(f"Confusion Matrix ({name}, threshold {m['threshold']:.2f})")
+    paths.append(os.path.join(output_dir, f'{name}_confusion_matrix.png'))
+    disp.figure_.savefig(paths[-1], dpi=120, bbox_inches='tight')
+    plt.close(disp.figure_)
+    return paths
+
+def evaluate(batch_size=64, num_workers=0, ensemble=True, sensitivity=1.0, threshold=0.5,
+             output_dir=None, profile=False, profile_trace=False, profile_dir=None, ensemble_check=3):
+    """
+    Scores the whole dataset and writes metrics.json plus plots to output_dir.
+
+    Probabilities stream into preallocated arrays. With ensemble=True the
+    production ensemble (network + ST heuristic + heart rate) is evaluated
+    alongside the raw network: predict_risk_batch on the raw records behind
+    X_data.npy, so it sees exactly what the app sees. The first
+    `ensemble_check` risks are compared with predict_risk (a warning only;
+    tests/test_ensemble.py covers the equivalence).
+    """
     # Paths
     base_dir = project_root
     processed_dir = os.path.join(base_dir, 'data', 'processed')
     data_path = os.path.join(processed_dir, 'X_data.npy')
     labels_path = os.path.join(processed_dir, 'y_labels.pkl')
     model_path = os.path.join(base_dir, 'src', 'neural_network', 'saved_model.pth')
+    output_dir = output_dir or os.path.join(base_dir, 'docs', 'results')
+    profile_dir = profile_dir or os.path.join(base_dir, 'profiles')
+    profiler = Profiler(enabled=profile, trace_dir=os.path.join(profile_dir, 'traces') if profile_trace else None)
 
     # Check files
     if not os.path.exists(model_path):
@@ -33,59 +215,112 @@ def evaluate():
 
     print("WARNING: Evaluating on the full dataset (Train + Val).")
 
-    data_loader = DataLoader(dataset, batch_size=32, shuffle=False)
+    data_loader = DataLoader(dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers)
 
     # 2. Load Model
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model = CNNLSTM(input_channels=12, num_classes=1).to(device)
-    model.load_state_dict(torch.load(model_path, map_location=device))
-    model.eval()
+    model = load_backend('eager', model_path, device, fuse=False)
+
+    raw_records = None
+    if ensemble:
+        from src.modules.ecg_processor import predict_risk, predict_risk_batch
+        from src.preprocessing.prepare_dataset import processed_records, read_raw_record
+        # The ensemble measures heart rate on raw millivolts, which X_data.npy (cleaned) no longer has
+        raw_records = processed_records(os.path.join(base_dir, 'data', 'raw'), processed_dir)
+        if raw_records is None or len(raw_records) != len(dataset):
+            print("WARNING: raw records behind X_data.npy not found; skipping the ensemble.")
+            ensemble = False
 
     print("Model loaded. Running predictions...")
 
-    all_preds = []
-    all_labels = []
+    n = len(dataset)
+    probabilities = np.empty(n, dtype=np.float64)
+    risks = np.empty(n, dtype=np.float64) if ensemble else None
+    all_labels = np.empty(n, dtype=np.float64)
 
-    with torch.no_grad():
+    profiler.start_trace()
+    start = time.perf_counter()
+    offset = 0
+    with torch.inference_mode():
+        t_ready = time.perf_counter()
         for inputs, labels in data_loader:
-            inputs = inputs.to(device)
-            outputs = model(inputs)
+            profiler.add('data_load', time.perf_counter() - t_ready)
+            end = offset + len(labels)
+            with profiler.stage('h2d'):
+                batch = inputs.to(device)
+            with profiler.stage('forward'):
+                probabilities[offset:end] = model(batch).squeeze(1).double().cpu().numpy()
+            all_labels[offset:end] = labels.numpy()
+
+            if ensemble:
+                with profiler.stage('ensemble'):
+                    raw = [read_raw_record(r) for r in raw_records[offset:end]]
+                    risks[offset:end] = predict_risk_batch(model, raw, sensitivity, batch_size=batch_size)
 
-            # Convert probabilities to binary predictions
-            preds = (outputs > 0.5).float().cpu().numpy()
-            all_preds.extend(preds)
-            all_labels.extend(labels.numpy())
+            offset = end
+            profiler.step()
+            t_ready = time.perf_counter()
+    elapsed = time.perf_counter() - start
+    profiler.stop_trace()
+    profiler.report()
+    profiler.write('evaluate', profile_dir, samples=n)
+    print(f"Scored {n} records in {elapsed:.1f}s ({n / max(elapsed, 1e-9):.1f} records/s)")
 
-    all_preds = np.array(all_preds).flatten()
-    all_labels = np.array(all_labels).flatten()
+    if ensemble:
+        # The batched ensemble should reproduce the app's per-record predict_risk
+        for i in range(min(ensemble_check, n)):
+            expected = predict_risk(model, read_raw_record(raw_records[i]), sensitivity)
+            if not np.isclose(risks[i], expected, rtol=0, atol=1e-6):
+                print(f"WARNING: ensemble risk {risks[i]:.6f} != predict_risk {expected:.6f} for {raw_records[i]}")
 
-    # Check unique classes in predictions and labels
-    unique_labels = np.unique(all_labels)
-    unique_preds = np.unique(all_preds)
-    print(f"Unique labels in data: {unique_labels}")
-    print(f"Unique predictions: {unique_preds}")
+    # Check unique classes in labels
+    print(f"Unique labels in data: {np.unique(all_labels)}")
 
     # 3. Metrics
-    print("\nClassification Report:")
-    # Force labels=[0, 1] to ensure both classes are reported even if one is missing in preds
-    # Also handle case where data might only have 0s if dataset is tiny
-    target_names = ['Normal/Other', 'MI']
-
-    try:
-        print(classification_report(all_labels, all_preds, labels=[0, 1], target_names=target_names, zero_division=0))
-    except Exception as e:
-        print(f"Could not generate full report: {e}")
-        print(classification_report(all_labels, all_preds, zero_division=0))
-
-    # 4. Confusion Matrix
-    cm = confusion_matrix(all_labels, all_preds, labels=[0, 1])
-    disp = ConfusionMatrixDisplay(confusion_matrix=cm, display_labels=target_names)
-
-    # Plot
-    plt.figure(figsize=(8, 6))
-    disp.plot(cmap=plt.cm.Blues)
-    plt.title('Confusion Matrix')
-    plt.show()
+    scorers = {'network': probabilities}
+    if ensemble:
+        scorers['ensemble'] = risks
+
+    os.makedirs(output_dir, exist_ok=True)
+    results = {
+        'samples': n,
+        'target': dataset.target,
+        'threshold': threshold,
+        'sensitivity': sensitivity,
+        'model_path': model_path,
+        'scorers': {},
+    }
+    for name, scores in scorers.items():
+        report, curves = score_report(all_labels, scores, threshold)
+        report['plots'] = save_plots(name, all_labels, scores, report, curves, output_dir)
+        results['scorers'][name] = report
+
+        print(f"\n[{name}] ROC AUC: {report['roc_auc']}  AP: {report['average_precision']}  "
+              f"Brier: {report['calibration']['brier']:.4f}  ECE: {report['calibration']['ece']:.4f}")
+        print("Classification Report:")
+        # Force labels=[0, 1] to ensure both classes are reported even if one is missing in preds
+        preds = (scores >= threshold).astype(np.float64)
+        print(classification_report(all_labels, preds, labels=[0, 1], target_names=TARGET_NAMES, zero_division=0))
+
+    metrics_path = os.path.join(output_dir, 'metrics.json')
+    with open(metrics_path, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"Metrics written to {metrics_path}")
+    return results
 
 if __name__ == "__main__":
-    evaluate()
+    parser = argparse.ArgumentParser(description="Evaluate the saved CNN-LSTM model (network and risk ensemble).")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--num-workers", type=int, default=0)
+    parser.add_argument("--no-ensemble", action="store_true", help="Evaluate the raw network only")
+    parser.add_argument("--sensitivity", type=float, default=1.0, help="Ensemble sensitivity, as in the app")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--output-dir", help="Where metrics.json and plots go (default: docs/results)")
+    parser.add_argument("--profile", action="store_true", help="Record per-stage timings")
+    parser.add_argument("--profile-trace", action="store_true", help="Also capture a torch.profiler trace")
+    parser.add_argument("--profile-dir")
+    args = parser.parse_args()
+
+    evaluate(batch_size=args.batch_size, num_workers=args.num_workers, ensemble=not args.no_ensemble,
+             sensitivity=args.sensitivity, threshold=args.threshold, output_dir=args.output_dir,
+             profile=args.profile, profile_trace=args.profile_trace, profile_dir=args.profile_dir)
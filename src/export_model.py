@@ -0,0 +1,102 @@
+import sys
+import os
+
+# Add project root to sys.path to allow imports from src
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import argparse
+import time
+import numpy as np
+import torch
+
+from src.neural_network.runtime import artifact_paths, load_backend, check_parity, check_mmap
+
+MODEL_PATH = os.path.join(project_root, 'src', 'neural_network', 'saved_model.pth')
+# Traced at the app's window (10s @ 500Hz); batch and time stay dynamic in ONNX
+EXAMPLE_SHAPE = (1, 12, 5000)
+ONNX_OPSET = 17
+
+def export_torchscript(model, path, example):
+    """
+    Traces (including the attention pooling) and freezes the model into a TorchScript file.
+    """
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example)
+        traced = torch.jit.freeze(traced)
+    traced.save(path)
+    return path
+
+def export_onnx(model, path, example):
+    """
+    Exports to ONNX with dynamic batch and time axes.
+    """
+    # TorchScript-based exporter: handles the bidirectional LSTM with dynamic axes
+    torch.onnx.export(model, (example,), path, input_names=['ecg'], output_names=['probability'],
+                      dynamic_axes={'ecg': {0: 'batch', 2: 'time'}, 'probability': {0: 'batch'}},
+                      opset_version=ONNX_OPSET, dynamo=False)
+    return path
+
+def latency(model, shape=EXAMPLE_SHAPE, repeats=20):
+    """
+    Median single-ECG forward latency in milliseconds.
+    """
+    x = torch.randn(*shape)
+    times = []
+    with torch.inference_mode():
+        model(x)  # warm-up
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(x)
+            times.append(time.perf_counter() - start)
+    return 1000 * float(np.median(times))
+
+def export(weights_path=MODEL_PATH, formats=('torchscript', 'onnx'), check=True, benchmark=True):
+    if not os.path.exists(weights_path):
+        print("Model file not found. Train the model first.")
+        return None
+
+    # Reference is the model exactly as trained; exports start from the Conv+BN folded one
+    eager = load_backend('eager', weights_path, fuse=False)
+    fused = load_backend('eager', weights_path)
+    if check:
+        mapped = check_mmap(fused, weights_path)
+        if mapped is not None:
+            print(f"Served eager weights memory-mapped: {mapped[0]}/{mapped[1]} non-conv parameters")
+    example = torch.randn(*EXAMPLE_SHAPE)
+    paths = artifact_paths(weights_path)
+
+    for fmt in formats:
+        exporter = export_torchscript if fmt == 'torchscript' else export_onnx
+        exporter(fused, paths[fmt], example)
+        print(f"Exported {fmt}: {paths[fmt]} ({os.path.getsize(paths[fmt]) / 1e6:.1f} MB)")
+
+    results = {}
+    for backend in ('eager', 'fused') + tuple(formats):
+        if backend in ('eager', 'fused'):
+            model = eager if backend == 'eager' else fused
+        else:
+            model = load_backend(backend, weights_path)
+        entry = {}
+        if check and backend != 'eager':
+            entry['max_abs_diff'] = check_parity(eager, model)
+        if benchmark:
+            entry['latency_ms'] = latency(model)
+        results[backend] = entry
+        print(f"{backend:<12} " + "  ".join(
+            f"{k}: {v:.3g}" for k, v in entry.items()) + ("  (parity OK)" if 'max_abs_diff' in entry else ""))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the trained model to TorchScript / ONNX and check parity.")
+    parser.add_argument("--weights", default=MODEL_PATH, help="State dict to export")
+    parser.add_argument("--format", choices=['torchscript', 'onnx'], action="append",
+                        help="Export only this format (repeatable; default: all)")
+    parser.add_argument("--no-check", action="store_true", help="Skip the eager parity check")
+    parser.add_argument("--no-benchmark", action="store_true", help="Skip latency measurement")
+    args = parser.parse_args()
+
+    export(args.weights, formats=tuple(args.format or ('torchscript', 'onnx')),
+           check=not args.no_check, benchmark=not args.no_benchmark)
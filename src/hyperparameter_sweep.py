@@ -0,0 +1,224 @@
+import sys
+import os
+
+# Add project root to sys.path to allow imports from src
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import argparse
+import contextlib
+import json
+import math
+import sqlite3
+import time
+import uuid
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+# Search space: name -> ('log', low, high) | ('uniform', low, high) | ('int', low, high) | ('choice', [values])
+DEFAULT_SPACE = {
+    'learning_rate': ('log', 1e-4, 3e-3),
+    'batch_size': ('choice', [16, 32, 64]),
+    'weight_decay': ('log', 1e-4, 1e-2),
+    'dropout': ('uniform', 0.2, 0.6),
+}
+
+DEFAULT_DB = os.path.join(project_root, 'sweeps', 'sweeps.db')
+
+# Median pruning: a trial is stopped once its val loss at an epoch is worse than the
+# median of the other trials at that epoch. Not before PRUNE_WARMUP epochs, and only
+# with at least PRUNE_MIN_TRIALS other reports to compare against.
+PRUNE_WARMUP = 3
+PRUNE_MIN_TRIALS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+    sweep TEXT, trial INTEGER, status TEXT, params TEXT,
+    best_val_loss REAL, final_val_loss REAL, epochs INTEGER, train_time REAL,
+    started REAL, finished REAL, error TEXT,
+    PRIMARY KEY (sweep, trial)
+);
+CREATE TABLE IF NOT EXISTS trial_epochs (
+    sweep TEXT, trial INTEGER, epoch INTEGER, val_loss REAL,
+    PRIMARY KEY (sweep, trial, epoch)
+);
+"""
+
+@contextlib.contextmanager
+def connect(db_path):
+    """
+    Connection to the sweep database for one `with` block: commits on success,
+    rolls back on error, and always closes (sqlite3's own context manager never closes).
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    # Trials in other processes write concurrently; wait on locks instead of failing
+    conn = sqlite3.connect(db_path, timeout=60)
+    try:
+        conn.executescript(SCHEMA)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def sample_config(space, rng):
+    """
+    Draws one configuration from the search space.
+    """
+    config = {}
+    for name, spec in space.items():
+        kind = spec[0]
+        if kind == 'log':
+            config[name] = float(math.exp(rng.uniform(math.log(spec[1]), math.log(spec[2]))))
+        elif kind == 'uniform':
+            config[name] = float(rng.uniform(spec[1], spec[2]))
+        elif kind == 'int':
+            config[name] = int(rng.integers(spec[1], spec[2] + 1))
+        elif kind == 'choice':
+            config[name] = spec[1][int(rng.integers(len(spec[1])))]
+        else:
+            raise ValueError(f"Unknown search space type '{kind}' for {name}")
+    return config
+
+class MedianPruner:
+    """
+    epoch_callback for train(): records the epoch's val loss in the results
+    table and asks to stop when it is worse than the median of the other trials.
+    """
+    def __init__(self, db_path, sweep, trial, warmup=PRUNE_WARMUP, min_trials=PRUNE_MIN_TRIALS):
+        self.db_path = db_path
+        self.sweep = sweep
+        self.trial = trial
+        self.warmup = warmup
+        self.min_trials = min_trials
+
+    def __call__(self, epoch, val_loss):
+        with connect(self.db_path) as conn:
+            conn.execute("INSERT OR REPLACE INTO trial_epochs VALUES (?, ?, ?, ?)",
+                         (self.sweep, self.trial, epoch, val_loss))
+            others = [row[0] for row in conn.execute(
+                "SELECT val_loss FROM trial_epochs WHERE sweep = ? AND epoch = ? AND trial != ?",
+                (self.sweep, epoch, self.trial))]
+        if epoch + 1 < self.warmup or len(others) < self.min_trials:
+            return False
+        return val_loss > float(np.median(others))
+
+def _init_trial_worker(threads):
+    import torch
+    # Thread budget per trial: concurrent trials split the cores instead of fighting over them
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+def run_trial(sweep, trial, params, base_config, db_path, prune):
+    """
+    Trains one configuration; returns (trial, summary or None, error or None).
+    """
+    from src.train_model import train
+
+    config = dict(base_config, **params)
+    # Trials never touch the shared saved_model.pth / checkpoints
+    config['save_model'] = False
+    if prune:
+        config['epoch_callback'] = MedianPruner(db_path, sweep, trial)
+
+    with connect(db_path) as conn:
+        conn.execute("UPDATE trials SET status = 'running', started = ? WHERE sweep = ? AND trial = ?",
+                     (time.time(), sweep, trial))
+    try:
+        summary = train(**config)
+        if summary is None:
+            raise RuntimeError("training did not run (missing data?)")
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        with connect(db_path) as conn:
+            conn.execute("UPDATE trials SET status = 'failed', error = ?, finished = ? WHERE sweep = ? AND trial = ?",
+                         (error, time.time(), sweep, trial))
+        return trial, None, error
+
+    with connect(db_path) as conn:
+        conn.execute("""UPDATE trials SET status = ?, best_val_loss = ?, final_val_loss = ?, epochs = ?,
+                        train_time = ?, finished = ? WHERE sweep = ? AND trial = ?""",
+                     ('pruned' if summary['pruned'] else 'complete', summary['best_val_loss'],
+                      summary['final_val_loss'], summary['epochs'], summary['train_time'],
+                      time.time(), sweep, trial))
+    return trial, summary, None
+
+def run_sweep(space=None, n_trials=16, parallel=None, threads_per_trial=None, base_config=None,
+              db_path=DEFAULT_DB, seed=0, prune=True, sweep=None):
+    """
+    Runs n_trials random-search trials, `parallel` at a time in a process pool.
+
+    Every trial memory-maps the same X_data.npy, so the dataset is held once in
+    the page cache whatever the parallelism. Each worker process is pinned to
+    threads_per_trial intra-op threads (default: cores / parallel). Results and
+    per-epoch val losses go to the sqlite table at db_path.
+    Returns the sweep id.
+    """
+    space = space or DEFAULT_SPACE
+    base_config = base_config or {}
+    cores = os.cpu_count() or 1
+    parallel = parallel or max(1, cores // 2)
+    threads_per_trial = threads_per_trial or max(1, cores // parallel)
+    sweep = sweep or time.strftime('%Y%m%d_%H%M%S_') + uuid.uuid4().hex[:6]
+
+    rng = np.random.default_rng(seed)
+    trials = [sample_config(space, rng) for _ in range(n_trials)]
+    with connect(db_path) as conn:
+        conn.executemany("INSERT INTO trials (sweep, trial, status, params) VALUES (?, ?, 'queued', ?)",
+                         [(sweep, i, json.dumps(p)) for i, p in enumerate(trials)])
+
+    print(f"Sweep {sweep}: {n_trials} trials, {parallel} at a time, {threads_per_trial} thread(s) each")
+    print(f"Results: {db_path}")
+
+    with ProcessPoolExecutor(max_workers=parallel, mp_context=get_context('spawn'),
+                             initializer=_init_trial_worker, initargs=(threads_per_trial,)) as pool:
+        futures = [pool.submit(run_trial, sweep, i, p, base_config, db_path, prune) for i, p in enumerate(trials)]
+        for future in as_completed(futures):
+            trial, summary, error = future.result()
+            if error is not None:
+                print(f"Trial {trial} failed: {error}")
+            else:
+                status = 'pruned' if summary['pruned'] else 'done'
+                print(f"Trial {trial} {status} after {summary['epochs']} epoch(s): "
+                      f"best val loss {summary['best_val_loss']:.4f} {trials[trial]}")
+
+    print_results(sweep, db_path)
+    return sweep
+
+def print_results(sweep, db_path=DEFAULT_DB, top=10):
+    with connect(db_path) as conn:
+        rows = conn.execute("""SELECT trial, status, best_val_loss, epochs, params FROM trials
+                               WHERE sweep = ? AND best_val_loss IS NOT NULL
+                               ORDER BY best_val_loss LIMIT ?""", (sweep, top)).fetchall()
+    print(f"\nTop {len(rows)} trials of sweep {sweep}:")
+    print("Trial  Status     Val Loss  Epochs  Params")
+    for trial, status, loss, epochs, params in rows:
+        print(f"{trial:5d}  {status:<9} {loss:9.4f}  {epochs:6d}  {params}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Random-search hyperparameter sweep over train().")
+    parser.add_argument("--trials", type=int, default=16)
+    parser.add_argument("--parallel", type=int, help="Concurrent trials (default: cores / 2)")
+    parser.add_argument("--threads-per-trial", type=int, help="Default: cores / parallel")
+    parser.add_argument("--epochs", type=int, default=20, help="Max epochs per trial")
+    parser.add_argument("--space", help="JSON file with the search space (default: DEFAULT_SPACE)")
+    parser.add_argument("--config", help="JSON file with fixed training options for every trial")
+    parser.add_argument("--db", default=DEFAULT_DB, help="sqlite results file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-prune", action="store_true", help="Disable median pruning")
+    args = parser.parse_args()
+
+    space = None
+    if args.space:
+        with open(args.space) as f:
+            space = json.load(f)
+    base_config = {}
+    if args.config:
+        with open(args.config) as f:
+            base_config = json.load(f)
+    base_config['epochs'] = args.epochs
+
+    run_sweep(space, n_trials=args.trials, parallel=args.parallel, threads_per_trial=args.threads_per_trial,
+              base_config=base_config, db_path=args.db, seed=args.seed, prune=not args.no_prune)
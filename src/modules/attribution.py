@@ -0,0 +1,101 @@
+import contextlib
+import numpy as np
+import torch
+
+# Integrated Gradients: interpolation steps between the baseline and the input
+IG_STEPS = 32
+# Interpolated inputs per forward/backward; bounds memory for long batches (0 = all at once)
+IG_MAX_BATCH = 256
+# Window around each R peak (s) for per-beat aggregation: P onset to T end at normal rates
+BEAT_WINDOW = (-0.25, 0.45)
+
+@contextlib.contextmanager
+def input_gradients(model):
+    """
+    Enables autograd w.r.t. the input only: parameters are frozen for the duration
+    (no .grad buffers are allocated or left behind) and restored afterwards,
+    even if the model was mid-training. cuDNN RNNs cannot backprop in eval mode,
+    so cuDNN is switched off inside.
+    """
+    params = list(model.parameters())
+    flags = [p.requires_grad for p in params]
+    try:
+        for p in params:
+            p.requires_grad_(False)
+        with torch.enable_grad(), torch.backends.cudnn.flags(enabled=False):
+            yield
+    finally:
+        for p, flag in zip(params, flags):
+            p.requires_grad_(flag)
+
+def _as_batch(cleaned_signals, device):
+    # (batch, time, 12) arrays or a list of equal-length (time, 12) ones -> (batch, 12, time) tensor
+    batch = np.stack([np.asarray(c, dtype=np.float32).T for c in cleaned_signals])
+    return torch.from_numpy(batch).to(device)
+
+def _gradients(model, inputs):
+    # Items are independent in eval mode, so d(sum)/d(input) is every item's own gradient
+    inputs = inputs.detach().requires_grad_(True)
+    output = model(inputs)
+    return torch.autograd.grad(output.sum(), inputs)[0]
+
+def saliency_batch(model, cleaned_signals, device='cpu'):
+    """
+    |d output / d input| for a batch of equal-length cleaned (time, 12) signals,
+    in one forward and one backward pass. Returns (batch, 12, time).
+    """
+    x = _as_batch(cleaned_signals, device)
+    with input_gradients(model):
+        return _gradients(model, x).abs().cpu().numpy()
+
+def integrated_gradients_batch(model, cleaned_signals, baseline=None, steps=IG_STEPS,
+                               max_batch=IG_MAX_BATCH, device='cpu'):
+    """
+    Integrated Gradients for a batch of equal-length cleaned (time, 12) signals.
+
+    All `steps` interpolations of all signals are stacked into one (batch * steps)
+    input and differentiated together (split into `max_batch` slices only to bound
+    memory). `baseline` defaults to the all-zero (flat) ECG. Returns signed
+    (batch, 12, time) attributions; per signal they sum to roughly
+    f(input) - f(baseline).
+    """
+    x = _as_batch(cleaned_signals, device)
+    baseline = torch.zeros_like(x) if baseline is None else torch.as_tensor(baseline, dtype=x.dtype, device=device).expand_as(x)
+    # Midpoint Riemann sum over the straight path
+    alphas = (torch.arange(steps, dtype=x.dtype, device=device) + 0.5) / steps
+    delta = x - baseline
+    # (steps, batch, 12, time) -> (steps * batch, 12, time)
+    path = (baseline.unsqueeze(0) + alphas.view(-1, 1, 1, 1) * delta.unsqueeze(0)).reshape(-1, *x.shape[1:])
+
+    max_batch = max_batch or len(path)
+    grads = torch.empty_like(path)
+    with input_gradients(model):
+        for start in range(0, len(path), max_batch):
+            grads[start:start + max_batch] = _gradients(model, path[start:start + max_batch])
+    avg_grads = grads.view(steps, *x.shape).mean(dim=0)
+    return (delta * avg_grads).detach().cpu().numpy()
+
+def downsample(attributions, factor):
+    """
+    Sums attributions over blocks of `factor` samples: (..., time) -> (..., ceil(time / factor)).
+    """
+    attributions = np.asarray(attributions)
+    pad = -attributions.shape[-1] % factor
+    if pad:
+        attributions = np.concatenate([attributions, np.zeros(attributions.shape[:-1] + (pad,))], axis=-1)
+    return attributions.reshape(attributions.shape[:-1] + (-1, factor)).sum(axis=-1)
+
+def beat_attribution(attributions, r_peaks, fs=500, window=BEAT_WINDOW):
+    """
+    Total |attribution| per lead and beat, over `window` around each R peak.
+    (12, time) -> (12, beats); beats whose window leaves the trace are skipped.
+    """
+    attributions = np.abs(np.asarray(attributions))
+    start, stop = int(window[0] * fs), int(window[1] * fs)
+    r_peaks = np.asarray(r_peaks, dtype=int)
+    r_peaks = r_peaks[(r_peaks + start >= 0) & (r_peaks + stop <= attributions.shape[-1])]
+    if len(r_peaks) == 0:
+        return np.zeros(attributions.shape[:-1] + (0,))
+    # (leads, beats, window) gather, then reduce over the window
+    idx = r_peaks[:, None] + np.arange(start, stop)[None, :]
+    return attributions[..., idx].sum(axis=-1)
@@ -2,8 +2,14 @@ import numpy as np
 import torch
 import os
 import sys
+import hashlib
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from functools import cached_property
 from scipy.signal import find_peaks
-import streamlit as st
 
 # Add project root to sys.path
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -11,82 +17,208 @@ project_root = os.path.dirname(os.path.dirname(current_dir))
 if project_root not in sys.path:
     sys.path.append(project_root)
 
-from src.neural_network.model import CNNLSTM
+from src.neural_network.runtime import default_backend, load_backend
 from src.preprocessing.signal_cleaner import SignalCleaner
+from src.preprocessing.resampling import MODEL_FS, ECGSignal, resample
+from src.modules import profiling
+from src.modules.attribution import saliency_batch, integrated_gradients_batch, beat_attribution, downsample, IG_STEPS
 
 # Use relative path for deployment compatibility
 MODEL_PATH = os.path.join(project_root, 'src', 'neural_network', 'saved_model.pth')
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-@st.cache_resource
-def load_model():
-    # Debugging: Print path and existence
-    print(f"Looking for model at: {MODEL_PATH}")
-    if not os.path.exists(MODEL_PATH):
-        print("Model file NOT found!")
-        return None
-    
-    print("Model file found. Loading...")
-    model = CNNLSTM(input_channels=12, num_classes=1)
-    try:
-        model.load_state_dict(torch.load(MODEL_PATH, map_location=DEVICE))
-        model.to(DEVICE)
-        model.eval()
-        print("Model loaded successfully.")
-        return model
-    except Exception as e:
-        print(f"Error loading model: {e}")
+# Warm-up input: one 10s 12-lead window at 500Hz, the shape the app scores
+WARMUP_SHAPE = (1, 12, 5000)
+
+logger = logging.getLogger(__name__)
+
+class ModelHandle:
+    """
+    A model being loaded (and warmed up) on a background thread.
+    `ready` is set once loading finished, successfully or not.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self.model = None
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._load, name=f'model-loader-{backend}', daemon=True)
+
+    def _load(self):
+        try:
+            if not os.path.exists(MODEL_PATH):
+                raise FileNotFoundError(f"Model file not found at {MODEL_PATH}")
+            # ONNX Runtime and the quantized kernels are CPU-only
+            device = DEVICE if self.backend in ('eager', 'torchscript', 'student') else 'cpu'
+            start = time.perf_counter()
+            model = load_backend(self.backend, MODEL_PATH, device)
+            self.load_seconds = time.perf_counter() - start
+            logger.info("Model loaded (%s backend) in %.2fs", self.backend, self.load_seconds)
+
+            # The first forward pays for lazy kernel/allocator init; do it now, not on a doctor's click
+            start = time.perf_counter()
+            with torch.inference_mode():
+                model(torch.zeros(WARMUP_SHAPE, device=device))
+            self.warmup_seconds = time.perf_counter() - start
+            logger.info("First inference (warm-up %s) took %.0f ms", WARMUP_SHAPE, 1000 * self.warmup_seconds)
+            self.model = model
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            logger.error("Model loading failed: %s", self.error)
+        finally:
+            self.ready.set()
+
+    def status(self):
+        return {
+            'backend': self.backend,
+            'ready': self.ready.is_set() and self.model is not None,
+            'loading': not self.ready.is_set(),
+            'error': self.error,
+            'load_seconds': self.load_seconds,
+            'warmup_seconds': self.warmup_seconds,
+        }
+
+_model_handles = {}
+_model_handles_lock = threading.Lock()
+
+def start_model_loading(backend=None):
+    """
+    Starts loading the model in the background (once per backend) and returns its handle.
+    Call it at process start; load_model() then returns without the cold-start wait.
+    """
+    backend = backend or default_backend()
+    with _model_handles_lock:
+        handle = _model_handles.get(backend)
+        if handle is None:
+            handle = _model_handles[backend] = ModelHandle(backend)
+            handle.thread.start()
+    return handle
+
+def model_status(backend=None):
+    """
+    Readiness of the (background-loaded) model, for the UI.
+    """
+    return start_model_loading(backend).status()
+
+def load_model(backend=None, timeout=None):
+    """
+    Returns the model for the given backend ('eager', 'torchscript', 'onnx', 'int8' or
+    'student', the distilled triage model),
+    by default the one named in the ECG_MODEL_BACKEND environment variable, else eager.
+    Waits for the background load if it is still running; None if loading failed.
+    """
+    handle = start_model_loading(backend)
+    if not handle.ready.wait(timeout):
         return None
+    return handle.model
 
-def generate_advanced_ecg(duration=10, fs=500, heart_rate=60, noise_level=0.05, 
-                          st_displacement=0.0, t_amplitude=0.25):
+# P-QRS-T template: (center after beat onset [s], width sigma [s]) per wave.
+# Order: P, Q, R, S, ST displacement, T.
+WAVE_CENTERS = np.array([0.2, 0.28, 0.3, 0.32, 0.4, 0.5])
+WAVE_WIDTHS = np.array([0.015, 0.005, 0.005, 0.005, 0.06, 0.04])
+# Beat-local support of the template. Every wave ends > 5 sigma inside it,
+# so truncating the Gaussians here is invisible in the output.
+BEAT_SUPPORT = 0.8
+# Sub-sample phases of the template bank. Beat onsets rarely fall on the
+# sample grid; 32 phases keep the QRS placement error below 1/64 sample.
+TEMPLATE_PHASES = 32
+# Beats scattered per step; bounds the (beats x support) temporaries.
+BEAT_CHUNK = 1024
+# Limb leads (I-aVF) are rendered at 70% of the precordial amplitude.
+LEAD_FACTORS = np.where(np.arange(12) >= 6, 1.0, 0.7)
+
+def generate_ecg_batch(params, duration=10, fs=500, seed=None, dtype=np.float64):
+    """
+    Renders a batch of synthetic 12-lead ECGs in a single call.
+
+    Each row of `params` is (heart_rate, noise_level, st_displacement, t_amplitude).
+    The Gaussian waves are rendered once on a short beat-local window (at
+    TEMPLATE_PHASES sub-sample offsets) and scatter-added at every beat onset,
+    so the cost is O(beats x support) instead of O(beats x samples).
+
+    Returns (signals, t) with signals shaped (N, T, 12).
+    """
+    params = np.atleast_2d(np.asarray(params, dtype=np.float64))
     if duration < 1: duration = 10
     if fs < 100: fs = 500
-    if noise_level < 0: noise_level = 0.0
-    
+    rng = np.random.default_rng(seed)
+
+    heart_rate = np.where(params[:, 0] <= 0, 60.0, params[:, 0])
+    noise_level = np.maximum(params[:, 1], 0.0)
+    st_displacement = params[:, 2]
+    t_amplitude = params[:, 3]
+    n_rows = len(params)
+
     num_points = int(duration * fs)
     t = np.linspace(0, duration, num_points)
-    
-    signal = np.zeros_like(t)
-    
-    if heart_rate <= 0: heart_rate = 60
+    dt = duration / (num_points - 1)
+
+    # Per-row wave amplitudes, same rules as the single-trace generator
+    q_depth = np.where(np.abs(st_displacement) > 0.1, 0.4, 0.1)
+    st_amp = np.where(np.abs(st_displacement) > 0.01, st_displacement, 0.0)
+    amps = np.stack([np.full(n_rows, 0.1), -q_depth, np.ones(n_rows),
+                     np.full(n_rows, -0.2), st_amp, t_amplitude], axis=1)
+
+    # Wave bank: (phase, window sample, wave), rendered once for the batch
+    window = np.arange(int(np.ceil(BEAT_SUPPORT / dt)) + 1)
+    phase_offset = np.arange(TEMPLATE_PHASES) / TEMPLATE_PHASES
+    tau = (window[None, :] - phase_offset[:, None]) * dt
+    bank = np.exp(-((tau[..., None] - WAVE_CENTERS) ** 2) / (2 * WAVE_WIDTHS ** 2))
+
+    # Beat onsets of every row, flattened in (row, time) order
     rr_interval = 60.0 / heart_rate
-    
-    signal += 0.05 * np.sin(2 * np.pi * 0.2 * t)
-    
-    num_beats = int(duration / rr_interval)
-    for i in range(num_beats + 1): 
-        t_beat = i * rr_interval
-        if t_beat > duration: break
-        
-        signal += 0.1 * np.exp(-((t - (t_beat + 0.2))**2) / (2 * 0.015**2))
-        q_depth = 0.1
-        if abs(st_displacement) > 0.1: q_depth = 0.4
-        signal -= q_depth * np.exp(-((t - (t_beat + 0.28))**2) / (2 * 0.005**2))
-        signal += 1.0 * np.exp(-((t - (t_beat + 0.3))**2) / (2 * 0.005**2))
-        signal -= 0.2 * np.exp(-((t - (t_beat + 0.32))**2) / (2 * 0.005**2))
-        if abs(st_displacement) > 0.01:
-            st_center = t_beat + 0.4
-            signal += st_displacement * np.exp(-((t - st_center)**2) / (2 * 0.06**2))
-        t_pos = 0.5
-        signal += t_amplitude * np.exp(-((t - (t_beat + t_pos))**2) / (2 * 0.04**2))
-
-    noise = np.random.normal(0, noise_level, size=len(t))
-    signal += noise
-    
-    multi_channel_signal = []
-    for i in range(12):
-        if i >= 6: factor = 1.0 
-        else: factor = 0.7
-        lead_noise = np.random.normal(0, 0.02, size=len(t))
-        multi_channel_signal.append((signal * factor) + lead_noise)
-        
-    return np.array(multi_channel_signal).T, t
+    beats_per_row = (duration / rr_interval).astype(np.int64) + 1
+    row = np.repeat(np.arange(n_rows), beats_per_row)
+    beat_idx = np.arange(len(row)) - np.repeat(np.cumsum(beats_per_row) - beats_per_row, beats_per_row)
+    t_beat = beat_idx * rr_interval[row]
+    keep = t_beat <= duration
+    row, t_beat = row[keep], t_beat[keep]
 
-def calculate_metrics(signal, fs=500):
-    if len(signal) == 0: return 0, 0
-    lead_data = signal[:, 0]
-    peaks, _ = find_peaks(lead_data, height=0.5, distance=fs*0.4)
+    position = t_beat / dt
+    onset = np.floor(position).astype(np.int64)
+    phase = np.rint((position - onset) * TEMPLATE_PHASES).astype(np.int64)
+    onset += phase // TEMPLATE_PHASES
+    phase %= TEMPLATE_PHASES
+
+    base = np.zeros((n_rows, num_points))
+    flat = base.reshape(-1)
+    for s in range(0, len(row), BEAT_CHUNK):
+        r, o, ph = row[s:s + BEAT_CHUNK], onset[s:s + BEAT_CHUNK], phase[s:s + BEAT_CHUNK]
+        values = np.einsum('bwk,bk->bw', bank[ph], amps[r])
+        sample = o[:, None] + window
+        inside = sample < num_points
+        idx = (r[:, None] * num_points + sample)[inside]
+        if idx.size == 0: continue
+        lo = idx.min()
+        flat[lo:idx.max() + 1] += np.bincount(idx - lo, weights=values[inside])
+
+    base += 0.05 * np.sin(2 * np.pi * 0.2 * t)
+    base += noise_level[:, None] * rng.standard_normal((n_rows, num_points))
+
+    # Expand to 12 leads in place: per-lead noise, then the scaled trace
+    signals = rng.standard_normal((n_rows, num_points, 12), dtype=dtype)
+    signals *= 0.02
+    signals[..., :6] += (LEAD_FACTORS[0] * base)[..., None]
+    signals[..., 6:] += (LEAD_FACTORS[6] * base)[..., None]
+
+    return signals, t
+
+def generate_advanced_ecg(duration=10, fs=500, heart_rate=60, noise_level=0.05, 
+                          st_displacement=0.0, t_amplitude=0.25):
+    signals, t = generate_ecg_batch([[heart_rate, noise_level, st_displacement, t_amplitude]],
+                                    duration=duration, fs=fs)
+    return signals[0], t
+
+def _rate_peaks(signal, fs=500):
+    """
+    R-peaks on lead I of the raw signal, used for the rate metrics.
+    """
+    peaks, _ = find_peaks(signal[:, 0], height=0.5, distance=fs*0.4)
+    return peaks
+
+def _rate_metrics(peaks, fs=500):
     if len(peaks) > 1:
         rr_intervals = np.diff(peaks) / fs
         avg_rr = np.mean(rr_intervals)
@@ -97,90 +229,460 @@ def calculate_metrics(signal, fs=500):
         hrv = 0
     return bpm, hrv
 
-def analyze_st_segment(signal, fs=500):
-    lead = signal[:, 6] if signal.shape[1] > 6 else signal[:, 0]
-    peaks, _ = find_peaks(lead, height=0.5, distance=fs*0.4)
-    
-    if len(peaks) < 2: return 0.0
-    
-    st_deviations = []
-    for peak in peaks[:-1]:
-        st_start = peak + int(0.08 * fs)
-        st_end = peak + int(0.12 * fs)
-        if st_end < len(lead):
-            baseline = np.mean(lead[peak - int(0.2 * fs) : peak - int(0.1 * fs)])
-            st_amp = np.mean(lead[st_start:st_end])
-            st_deviations.append(st_amp - baseline)
-            
-    if not st_deviations: return 0.0
-    
-    avg_st_dev = np.mean(st_deviations)
-    
-    # More aggressive risk mapping for heuristic
-    risk = 0.0
-    if abs(avg_st_dev) > 0.05:
-        # Push quickly to high risk if deviation exists
-        risk = min(0.95, abs(avg_st_dev) * 4.0) 
-        
-    return risk
-
-def predict_risk(model, signal, sensitivity=1.0):
-    if len(signal) < 50: return 0.0
+def calculate_metrics(signal, fs=500):
+    return get_analysis_context(signal, fs).metrics
 
-    cleaner = SignalCleaner()
-    try:
-        cleaned_signal = cleaner.process(signal)
-    except:
-        return 0.0
-        
-    if np.isnan(cleaned_signal).any():
-        cleaned_signal = np.nan_to_num(cleaned_signal)
-
-    input_tensor = torch.tensor(cleaned_signal.T, dtype=torch.float32).unsqueeze(0).to(DEVICE)
-    
-    with torch.no_grad():
-        ai_prob = model(input_tensor).item()
-    
-    # REMOVED ARTIFICIAL POLARIZATION
-    # We use the raw probability directly to avoid jumps
-    
-    heuristic_risk = analyze_st_segment(cleaned_signal)
-    
-    bpm, _ = calculate_metrics(signal)
-    hr_risk = 0.0
-    if bpm > 100 or bpm < 50:
-        hr_risk = 0.15
-        
+def st_risk(avg_st_dev):
+    """
+    Maps the mean ST deviation to the heuristic risk. Works on scalars and arrays.
+    """
+    deviation = np.abs(avg_st_dev)
+    # More aggressive risk mapping for heuristic:
+    # push quickly to high risk if deviation exists
+    return np.where(deviation > 0.05, np.minimum(0.95, deviation * 4.0), 0.0)
+
+def hr_risk(bpm):
+    """
+    Flat penalty for tachycardia / bradycardia. Works on scalars and arrays.
+    """
+    bpm = np.asarray(bpm)
+    return np.where((bpm > 100) | (bpm < 50), 0.15, 0.0)
+
+def blend_risk(ai_prob, heuristic_risk, heart_rate_risk, sensitivity=1.0):
+    """
+    Weighted ensemble + soft scaling, shared by the scalar and batch paths.
+    """
     # Weighted Ensemble
     # AI has 60% weight, Heuristics 30%, HR 10%
-    base_risk = (ai_prob * 0.6) + (heuristic_risk * 0.3) + hr_risk
+    base_risk = (np.asarray(ai_prob) * 0.6) + (heuristic_risk * 0.3) + heart_rate_risk
     
     # Apply sensitivity
     final_risk = base_risk * sensitivity
     
     # Soft Sigmoid-like scaling instead of hard steps
     # This pushes values gently towards extremes without breaking continuity
-    def soft_scale(x):
-        return 1 / (1 + np.exp(-10 * (x - 0.5)))
+    soft_scaled = 1 / (1 + np.exp(-10 * (final_risk - 0.5)))
     
     # Blend the linear risk with the soft scaled risk
     # This gives confidence but maintains stability
-    final_risk = (final_risk * 0.7) + (soft_scale(final_risk) * 0.3)
+    final_risk = (final_risk * 0.7) + (soft_scaled * 0.3)
     
-    return max(0.01, min(0.99, final_risk))
+    return np.clip(final_risk, 0.01, 0.99)
 
-def compute_saliency(model, signal):
-    if len(signal) < 50: return None
-    cleaner = SignalCleaner()
+# Lead used for beat detection and the scalar ST heuristic (V1)
+ST_REFERENCE_LEAD = 6
+# Beat-relative windows [start, end) in seconds around each R-peak
+ST_BASELINE_WINDOW = (-0.2, -0.1)
+ST_SEGMENT_WINDOW = (0.08, 0.12)
+
+def st_deviation_matrix(signal, fs=500, peaks=None):
+    """
+    ST deviation (ST level minus PR baseline) of every lead at every beat of a
+    cleaned (time, leads) signal, as a (leads, beats) matrix.
+
+    Beats are the R-peaks of the reference lead, last one excluded. Window means
+    are differences of one cumulative sum over time, so all leads and beats are
+    done without a per-beat loop. Beats whose windows leave the trace are dropped.
+    """
+    ref = ST_REFERENCE_LEAD if signal.shape[1] > ST_REFERENCE_LEAD else 0
+    if peaks is None:
+        peaks, _ = find_peaks(signal[:, ref], height=0.5, distance=fs*0.4)
+
+    beats = np.asarray(peaks)[:-1]
+    base_start = beats + int(ST_BASELINE_WINDOW[0] * fs)
+    base_end = beats + int(ST_BASELINE_WINDOW[1] * fs)
+    st_start = beats + int(ST_SEGMENT_WINDOW[0] * fs)
+    st_end = beats + int(ST_SEGMENT_WINDOW[1] * fs)
+    keep = (base_start >= 0) & (st_end < len(signal))
+    if not keep.any():
+        return np.zeros((signal.shape[1], 0))
+    base_start, base_end = base_start[keep], base_end[keep]
+    st_start, st_end = st_start[keep], st_end[keep]
+
+    csum = np.zeros((len(signal) + 1, signal.shape[1]))
+    np.cumsum(signal, axis=0, out=csum[1:])
+    baseline = (csum[base_end] - csum[base_start]) / (base_end - base_start)[:, None]
+    st_amp = (csum[st_end] - csum[st_start]) / (st_end - st_start)[:, None]
+    return (st_amp - baseline).T
+
+def st_deviation(signal, fs=500, deviations=None):
+    """
+    Mean ST deviation on the reference lead of a cleaned signal.
+    Returns None when no usable beat is found.
+    """
+    if deviations is None:
+        deviations = st_deviation_matrix(signal, fs)
+    if deviations.shape[1] == 0: return None
+    ref = ST_REFERENCE_LEAD if signal.shape[1] > ST_REFERENCE_LEAD else 0
+    return deviations[ref].mean()
+
+def st_deviation_batch(signals, fs=500, peaks=None):
+    """
+    Mean reference-lead ST deviation of every cleaned signal in a stacked
+    (N, time, leads) batch; NaN where no usable beat is found.
+
+    Only R-peak detection runs per record. The beats of all records are
+    flattened, and their window means come from one cumulative sum over the batch.
+    Same values as st_deviation on each record.
+    """
+    signals = np.asarray(signals)
+    n, length, leads = signals.shape
+    if n == 0:
+        return np.zeros(0)
+    ref = ST_REFERENCE_LEAD if leads > ST_REFERENCE_LEAD else 0
+    lead = signals[:, :, ref]
+    if peaks is None:
+        peaks = [find_peaks(x, height=0.5, distance=fs*0.4)[0] for x in lead]
+
+    # Flattened (record, beat) pairs, last beat of each record excluded
+    beats = [np.asarray(p, dtype=np.int64)[:-1] for p in peaks]
+    record = np.repeat(np.arange(n), [len(b) for b in beats])
+    beats = np.concatenate(beats)
+    base_start = beats + int(ST_BASELINE_WINDOW[0] * fs)
+    base_end = beats + int(ST_BASELINE_WINDOW[1] * fs)
+    st_start = beats + int(ST_SEGMENT_WINDOW[0] * fs)
+    st_end = beats + int(ST_SEGMENT_WINDOW[1] * fs)
+    keep = (base_start >= 0) & (st_end < length)
+    record, base_start, base_end = record[keep], base_start[keep], base_end[keep]
+    st_start, st_end = st_start[keep], st_end[keep]
+
+    csum = np.zeros((n, length + 1))
+    np.cumsum(lead, axis=1, out=csum[:, 1:])
+    baseline = (csum[record, base_end] - csum[record, base_start]) / (base_end - base_start)
+    st_amp = (csum[record, st_end] - csum[record, st_start]) / (st_end - st_start)
+
+    counts = np.bincount(record, minlength=n)
+    sums = np.bincount(record, weights=st_amp - baseline, minlength=n)
+    deviation = np.full(n, np.nan)
+    np.divide(sums, counts, out=deviation, where=counts > 0)
+    return deviation
+
+def analyze_st_segment(signal, fs=500):
+    avg_st_dev = st_deviation(signal, fs)
+    if avg_st_dev is None: return 0.0
+    return float(st_risk(avg_st_dev))
+
+def _model_probability(model, cleaned_signal):
+    with profiling.stage('h2d'):
+        input_tensor = torch.tensor(cleaned_signal.T, dtype=torch.float32).unsqueeze(0).to(DEVICE)
+
+    with torch.no_grad(), profiling.stage('forward'):
+        return model(input_tensor).item()
+
+def predict_risk(model, signal, sensitivity=1.0, fs=None):
+    if len(signal) < 50: return 0.0
+    return get_analysis_context(signal, fs).risk(model, sensitivity)
+
+def _clean_group(cleaner, signals):
+    """
+    Cleans equal-length records in one batched pass.
+    Falls back to per-record cleaning so one bad record does not sink the group.
+    Returns (cleaned, ok_mask).
+    """
     try:
-        cleaned_signal = cleaner.process(signal)
-    except: return None
-    input_tensor = torch.tensor(cleaned_signal.T, dtype=torch.float32).unsqueeze(0).to(DEVICE)
-    input_tensor.requires_grad_()
-    output = model(input_tensor)
-    model.zero_grad()
-    output.backward(torch.ones_like(output))
-    saliency = input_tensor.grad.data.abs().squeeze().cpu().numpy()
-    if saliency.ndim == 2: saliency_v1 = saliency[6, :] 
-    else: saliency_v1 = saliency
-    return saliency_v1
+        return cleaner.process(signals), np.ones(len(signals), dtype=bool)
+    except Exception:
+        cleaned = np.zeros(signals.shape)
+        ok = np.zeros(len(signals), dtype=bool)
+        for j, sig in enumerate(signals):
+            try:
+                cleaned[j] = cleaner.process(sig)
+                ok[j] = True
+            except Exception:
+                pass
+        return cleaned, ok
+
+def length_buckets(lengths, batch_size=32, exact=False):
+    """
+    Splits record indices into forward batches of up to `batch_size`, sorted by
+    length so each padded batch wastes little. With exact=True a batch only holds
+    records of one length (for backends that cannot take a padding mask).
+    """
+    lengths = np.asarray(lengths)
+    order = np.argsort(lengths, kind='stable')
+    buckets = []
+    start = 0
+    while start < len(order):
+        end = min(start + batch_size, len(order))
+        if exact:
+            same = lengths[order[start:end]] == lengths[order[start]]
+            end = start + int(np.argmin(same)) if not same.all() else end
+        buckets.append(order[start:end])
+        start = end
+    return buckets
+
+def _model_probabilities(model, cleaned_signals):
+    """
+    One forward pass over (time, 12) signals. Unequal lengths are zero-padded
+    to the longest and passed to the model with their lengths.
+    """
+    lengths = [len(c) for c in cleaned_signals]
+    batch = np.zeros((len(cleaned_signals), 12, max(lengths)), dtype=np.float32)
+    for j, c in enumerate(cleaned_signals):
+        batch[j, :, :len(c)] = c.T
+    with profiling.stage('h2d'):
+        input_tensor = torch.from_numpy(batch).to(DEVICE)
+    with profiling.stage('forward'):
+        if min(lengths) == max(lengths):
+            output = model(input_tensor)
+        else:
+            output = model(input_tensor, lengths=torch.tensor(lengths, device=DEVICE))
+    return output.squeeze(1).cpu().numpy()
+
+def predict_risk_batch(model, signals, sensitivity=1.0, batch_size=32, fs=MODEL_FS):
+    """
+    Scores many ECGs with batched cleaning and forward passes.
+
+    `signals` is a list of (time, 12) recordings or a stacked (N, time, 12) array.
+    Records of equal length are cleaned together; the model runs on length
+    buckets of up to `batch_size` (ragged batches are zero-padded and masked),
+    and the ensemble is blended as array operations.
+    Records sampled at `fs` are resampled to the model's rate first.
+    Returns an (N,) array with the same per-record risks as predict_risk.
+    """
+    if fs != MODEL_FS:
+        with profiling.stage('resampling'):
+            if isinstance(signals, np.ndarray) and signals.ndim == 3:
+                signals = resample(signals, fs)
+            else:
+                signals = [resample(sig, fs) for sig in signals]
+    n = len(signals)
+    risks = np.zeros(n)
+    ai_prob = np.zeros(n)
+    heuristic_risk = np.zeros(n)
+    bpm = np.zeros(n)
+    cleaned_records = [None] * n
+    valid = np.zeros(n, dtype=bool)
+    cleaner = SignalCleaner()
+
+    # Group records by shape so each group is one stacked array
+    if isinstance(signals, np.ndarray) and signals.ndim == 3:
+        groups = {signals.shape[1:]: np.arange(n)} if signals.shape[1] >= 50 else {}
+    else:
+        groups = {}
+        for i, sig in enumerate(signals):
+            if len(sig) >= 50:
+                groups.setdefault(np.shape(sig), []).append(i)
+
+    for idx in groups.values():
+        idx = np.asarray(idx)
+        if isinstance(signals, np.ndarray) and len(idx) == n:
+            stacked = signals
+        else:
+            stacked = np.stack([np.asarray(signals[i]) for i in idx])
+
+        with profiling.stage('cleaning'):
+            cleaned, ok = _clean_group(cleaner, stacked)
+            np.nan_to_num(cleaned, copy=False)
+        cleaned, idx = cleaned[ok], idx[ok]
+        valid[idx] = True
+
+        for j, i in enumerate(idx):
+            cleaned_records[i] = cleaned[j]
+
+        # Helpers are called directly: contexts would pin views of the whole batch
+        with profiling.stage('heuristics'):
+            heuristic_risk[idx], bpm[idx] = heuristic_scores(cleaned, [signals[i] for i in idx])
+
+    # Forward passes mix lengths: records are bucketed by length and padded per batch
+    order = np.flatnonzero(valid)
+    lengths = np.array([len(cleaned_records[i]) for i in order], dtype=np.int64)
+    exact = not getattr(model, 'supports_lengths', False)
+    with torch.no_grad():
+        for bucket in length_buckets(lengths, batch_size, exact=exact):
+            ai_prob[order[bucket]] = _model_probabilities(model, [cleaned_records[i] for i in order[bucket]])
+
+    risks[valid] = blend_risk(ai_prob[valid], heuristic_risk[valid], hr_risk(bpm[valid]), sensitivity)
+    return risks
+
+def heuristic_scores(cleaned, raw=None, fs=500):
+    """
+    ST heuristic risk and heart rate for a batch of cleaned (time, 12) signals.
+    BPM is measured on the raw signals when given (as predict_risk does),
+    otherwise on the cleaned ones. Returns (heuristic_risk, bpm) arrays.
+    Signals in one call share a length. Only peak detection loops over records;
+    ST windows and rates are computed for the whole batch at once.
+    """
+    cleaned = np.asarray(cleaned)
+    raw = cleaned if raw is None else raw
+    deviation = st_deviation_batch(cleaned, fs)
+    heuristic_risk = np.where(np.isnan(deviation), 0.0, st_risk(np.nan_to_num(deviation)))
+
+    # Mean RR interval of each record from its first and last peak
+    peaks = [_rate_peaks(np.asarray(r), fs) for r in raw]
+    count = np.array([len(p) for p in peaks])
+    span = np.array([p[-1] - p[0] if len(p) > 1 else 0 for p in peaks], dtype=np.float64)
+    bpm = np.zeros(len(peaks))
+    np.divide(60.0 * fs * (count - 1), span, out=bpm, where=count > 1)
+    return heuristic_risk, bpm
+
+def _attributions(model, cleaned_signals, method='saliency', steps=IG_STEPS):
+    # ONNX Runtime sessions have no autograd
+    if not getattr(model, 'supports_grad', True): return None
+    with profiling.stage('attribution'):
+        if method == 'saliency':
+            return saliency_batch(model, cleaned_signals, DEVICE)
+        if method == 'integrated_gradients':
+            return integrated_gradients_batch(model, cleaned_signals, steps=steps, device=DEVICE)
+    raise ValueError(f"Unknown attribution method '{method}', expected 'saliency' or 'integrated_gradients'")
+
+def _saliency(model, cleaned_signal):
+    saliency = _attributions(model, [cleaned_signal])
+    return None if saliency is None else saliency[0]
+
+def compute_saliency(model, signal, fs=None):
+    """
+    Gradient saliency of all 12 leads, (12, time); None if unavailable.
+    """
+    if len(signal) < 50: return None
+    return get_analysis_context(signal, fs).saliency(model)
+
+def compute_attributions_batch(model, signals, method='saliency', steps=IG_STEPS, per_beat=False,
+                               factor=None, fs=None, batch_size=32):
+    """
+    12-lead attributions for many ECGs: 'saliency' (|gradient|) or
+    'integrated_gradients' (signed, `steps` interpolations batched together).
+
+    Signals go through their shared analysis contexts, so cleaning is cached.
+    Records of equal length share one forward/backward per `batch_size`.
+    Returns a list with, per record, a (12, time) array, (12, ceil(time / factor))
+    when `factor` is given, (12, beats) with per_beat=True, or None
+    if the record could not be analyzed.
+    """
+    contexts = [get_analysis_context(sig, fs) if len(sig) >= 50 else None for sig in signals]
+    results = [None] * len(signals)
+    valid = [i for i, ctx in enumerate(contexts) if ctx is not None and ctx.cleaned is not None]
+    lengths = [len(contexts[i].cleaned) for i in valid]
+    # IG slices its (records * steps) stack by IG_MAX_BATCH itself
+    for bucket in length_buckets(lengths, batch_size, exact=True):
+        idx = [valid[b] for b in bucket]
+        attributions = _attributions(model, [contexts[i].cleaned for i in idx], method, steps)
+        if attributions is None:
+            return results
+        for i, attr in zip(idx, attributions):
+            if method == 'saliency':
+                contexts[i]._saliency[model] = attr
+            if per_beat:
+                attr = beat_attribution(attr, contexts[i].r_peaks, contexts[i].fs)
+            elif factor:
+                attr = downsample(attr, factor)
+            results[i] = attr
+    return results
+
+# --- Per-recording analysis cache ---
+CONTEXT_CACHE_SIZE = 32
+_contexts = OrderedDict()
+_contexts_lock = threading.Lock()
+
+class AnalysisContext:
+    """
+    Lazily computed, memoized analysis artifacts for one recording.
+    Obtain it through get_analysis_context so equal signals share one instance.
+    """
+    def __init__(self, signal, fs=500):
+        self.signal = signal
+        self.fs = fs
+        self._ai_prob = weakref.WeakKeyDictionary()
+        self._saliency = weakref.WeakKeyDictionary()
+
+    @cached_property
+    def cleaned(self):
+        """Cleaned signal, or None if the recording is too short or cleaning fails."""
+        if len(self.signal) < 50: return None
+        try:
+            with profiling.stage('cleaning'):
+                cleaned_signal = SignalCleaner(sampling_rate=self.fs).process(self.signal)
+        except Exception:
+            return None
+        return np.nan_to_num(cleaned_signal, copy=False)
+
+    @cached_property
+    def r_peaks(self):
+        if len(self.signal) == 0: return np.array([], dtype=int)
+        with profiling.stage('heuristics'):
+            return _rate_peaks(self.signal, self.fs)
+
+    @cached_property
+    def metrics(self):
+        """(bpm, hrv) from the raw signal."""
+        if len(self.signal) == 0: return 0, 0
+        peaks = self.r_peaks
+        with profiling.stage('heuristics'):
+            return _rate_metrics(peaks, self.fs)
+
+    @cached_property
+    def st_deviations(self):
+        """(leads, beats) ST deviation matrix of the cleaned signal."""
+        if self.cleaned is None: return None
+        cleaned = self.cleaned
+        with profiling.stage('heuristics'):
+            return st_deviation_matrix(cleaned, self.fs)
+
+    @cached_property
+    def lead_st_deviation(self):
+        """Mean ST deviation per lead, for localizing the affected territory."""
+        if self.st_deviations is None or self.st_deviations.shape[1] == 0: return None
+        return self.st_deviations.mean(axis=1)
+
+    @cached_property
+    def st_deviation(self):
+        if self.cleaned is None: return None
+        return st_deviation(self.cleaned, self.fs, self.st_deviations)
+
+    @cached_property
+    def heuristic_risk(self):
+        if self.st_deviation is None: return 0.0
+        return float(st_risk(self.st_deviation))
+
+    def ai_probability(self, model):
+        if model not in self._ai_prob:
+            self._ai_prob[model] = _model_probability(model, self.cleaned)
+        return self._ai_prob[model]
+
+    def saliency(self, model):
+        if self.cleaned is None: return None
+        if model not in self._saliency:
+            self._saliency[model] = _saliency(model, self.cleaned)
+        return self._saliency[model]
+
+    def risk(self, model, sensitivity=1.0):
+        if self.cleaned is None: return 0.0
+        bpm, _ = self.metrics
+        return float(blend_risk(self.ai_probability(model), self.heuristic_risk, hr_risk(bpm), sensitivity))
+
+def signal_hash(signal, fs=500):
+    """
+    Content hash of a recording (values, shape, dtype and sampling rate).
+    """
+    signal = np.ascontiguousarray(signal)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{signal.shape}|{signal.dtype}|{fs}".encode())
+    h.update(signal.data)
+    return h.hexdigest()
+
+def get_analysis_context(signal, fs=None):
+    """
+    Returns the shared AnalysisContext for this signal's content,
+    keeping the CONTEXT_CACHE_SIZE most recently used ones.
+
+    `signal` is an ECGSignal or an array sampled at `fs` (default MODEL_FS).
+    Other rates are resampled to MODEL_FS once, when the context is created.
+    """
+    if isinstance(signal, ECGSignal):
+        signal, fs = signal.data, signal.fs
+    fs = MODEL_FS if fs is None else fs
+    signal = np.asarray(signal)
+    key = signal_hash(signal, fs)
+    with _contexts_lock:
+        ctx = _contexts.get(key)
+        if ctx is None:
+            # Own a copy so later in-place edits by the caller cannot go stale
+            with profiling.stage('resampling'):
+                data = resample(signal, fs) if fs != MODEL_FS else signal.copy()
+            ctx = AnalysisContext(data, MODEL_FS)
+            _contexts[key] = ctx
+            if len(_contexts) > CONTEXT_CACHE_SIZE:
+                _contexts.popitem(last=False)
+        else:
+            _contexts.move_to_end(key)
+    return ctx
@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+import torch
+
+# Add project root to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+PROFILE_DIR = os.path.join(project_root, 'profiles')
+
+# Shared no-op context: a disabled profiler hands this out without allocating
+_NULL_STAGE = nullcontext()
+
+class _Stage:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler.sync_cuda:
+            # Kernels are asynchronous; wait so the time lands on the stage that launched them
+            torch.cuda.synchronize()
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+        return False
+
+class Profiler:
+    """
+    Per-stage wall-clock timer.
+
+    `with profiler.stage('forward'): ...` accumulates time and call counts per
+    stage name. When disabled, stage() returns a shared no-op context, so
+    instrumented code costs one method call. Optionally records a
+    torch.profiler trace (Chrome/TensorBoard format) into trace_dir.
+    """
+    def __init__(self, enabled=False, trace_dir=None):
+        self.enabled = enabled
+        self.trace_dir = trace_dir if enabled else None
+        self.sync_cuda = enabled and torch.cuda.is_available()
+        self.totals = {}
+        self.counts = {}
+        self._torch_profiler = None
+        self._start = time.perf_counter()
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def add(self, name, seconds):
+        """
+        Records time measured elsewhere (e.g. DataLoader wait) under `name`.
+        """
+        if not self.enabled: return
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def start_trace(self, wait=1, warmup=1, active=3):
+        """
+        Starts a torch.profiler trace when trace_dir is set; call step() once per iteration.
+        """
+        if self.trace_dir is None: return
+        from torch.profiler import profile, schedule, tensorboard_trace_handler, ProfilerActivity
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        os.makedirs(self.trace_dir, exist_ok=True)
+        self._torch_profiler = profile(activities=activities,
+                                       schedule=schedule(wait=wait, warmup=warmup, active=active, repeat=1),
+                                       on_trace_ready=tensorboard_trace_handler(self.trace_dir),
+                                       record_shapes=True)
+        self._torch_profiler.start()
+
+    def stop_trace(self):
+        if self._torch_profiler is not None:
+            self._torch_profiler.stop()
+            self._torch_profiler = None
+
+    def step(self):
+        if self._torch_profiler is not None:
+            self._torch_profiler.step()
+
+    def summary(self):
+        wall = time.perf_counter() - self._start
+        stages = {
+            name: {
+                'total_s': total,
+                'calls': self.counts[name],
+                'mean_ms': 1000 * total / self.counts[name],
+                'share': total / wall if wall > 0 else 0.0,
+            }
+            for name, total in sorted(self.totals.items(), key=lambda kv: -kv[1])
+        }
+        return {'wall_s': wall, 'stages': stages}
+
+    def report(self):
+        if not self.enabled: return
+        summary = self.summary()
+        print(f"\nProfile ({summary['wall_s']:.2f}s wall):")
+        for name, s in summary['stages'].items():
+            print(f"  {name:<12} {s['total_s']:9.3f}s  {s['calls']:6d} calls  {s['mean_ms']:9.3f} ms/call  {100 * s['share']:5.1f}%")
+
+    def write(self, run_name, directory=None, **extra):
+        """
+        Writes the stage summary (plus `extra` metadata) to <directory>/<run_name>_<timestamp>.json.
+        Returns the path, or None when disabled.
+        """
+        if not self.enabled: return None
+        directory = directory or PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{run_name}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        payload = {
+            'run': run_name,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'host': platform.node(),
+            'torch': torch.__version__,
+            'device': 'cuda' if torch.cuda.is_available() else 'cpu',
+            'threads': torch.get_num_threads(),
+            **extra,
+            **self.summary(),
+        }
+        with open(path, 'w') as f:
+            json.dump(payload, f, indent=2, default=str)
+        print(f"Profile written to {path}")
+        return path
+
+# Profiler used by library code (ecg_processor); disabled unless a caller installs one
+_active = Profiler(enabled=False)
+
+def active_profiler():
+    return _active
+
+def stage(name):
+    """
+    Times a stage on the active profiler (no-op by default).
+    """
+    return _active.stage(name)
+
+@contextmanager
+def use_profiler(profiler):
+    """
+    Installs `profiler` as the active one for the duration of the block.
+    """
+    global _active
+    previous, _active = _active, profiler
+    try:
+        yield profiler
+    finally:
+        _active = previous
+
+def profile_inference(n=32, batch=False, trace=False, directory=None):
+    """
+    Profiles predict_risk (or predict_risk_batch) on n synthetic 10s recordings.
+    """
+    from src.modules.ecg_processor import load_model, generate_ecg_batch, predict_risk, predict_risk_batch
+
+    model = load_model()
+    if model is None:
+        print("Model not available.")
+        return None
+
+    rng = np.random.default_rng(0)
+    # (heart_rate, noise_level, st_displacement, t_amplitude) per record
+    params = np.column_stack([
+        rng.uniform(50, 110, n),
+        np.full(n, 0.05),
+        rng.uniform(-0.3, 0.3, n),
+        rng.uniform(0.2, 0.5, n),
+    ])
+    signals, _ = generate_ecg_batch(params, seed=0)
+
+    directory = directory or PROFILE_DIR
+    profiler = Profiler(enabled=True, trace_dir=os.path.join(directory, 'traces') if trace else None)
+    with use_profiler(profiler):
+        profiler.start_trace(wait=0, warmup=1, active=min(n, 5))
+        if batch:
+            predict_risk_batch(model, signals)
+        else:
+            for sig in signals:
+                predict_risk(model, sig)
+                profiler.step()
+        profiler.stop_trace()
+    profiler.report()
+    profiler.write('predict_risk_batch' if batch else 'predict_risk', directory, records=n)
+    return profiler.summary()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-stage profile of the inference path on synthetic ECGs.")
+    parser.add_argument("--records", type=int, default=32)
+    parser.add_argument("--batch", action="store_true", help="Profile predict_risk_batch instead of predict_risk")
+    parser.add_argument("--trace", action="store_true", help="Also record a torch.profiler trace")
+    parser.add_argument("--output-dir", help=f"Where to write the JSON summary (default: {PROFILE_DIR})")
+    args = parser.parse_args()
+
+    profile_inference(args.records, batch=args.batch, trace=args.trace, directory=args.output_dir)
@@ -0,0 +1,170 @@
+import numpy as np
+import torch
+import os
+import sys
+import argparse
+
+# Add project root to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.preprocessing.signal_cleaner import SignalCleaner, StreamingCleaner
+from src.preprocessing.resampling import MODEL_FS, ECGSignal, StreamingResampler
+from src.modules.ecg_processor import (
+    DEVICE, analyze_st_segment, blend_risk, hr_risk, _rate_metrics, _rate_peaks
+)
+
+# Model windows: 10s at the model's 500Hz, a new one every 5s
+WINDOW_SIZE = 5000
+HOP_SIZE = 2500
+
+def iter_csv_chunks(path, chunk_size=50000, fs=MODEL_FS):
+    """
+    Yields ECGSignal chunks (time, 12) of a CSV recording sampled at `fs`, without loading it whole.
+    """
+    import pandas as pd
+    for df in pd.read_csv(path, chunksize=chunk_size):
+        yield ECGSignal(df.iloc[:, :12].values, fs)
+
+def iter_wfdb_chunks(record_path, chunk_size=50000):
+    """
+    Yields ECGSignal chunks (time, channels) of a WFDB record (e.g. a Holter file),
+    at the sampling rate in its header.
+    """
+    import wfdb
+    header = wfdb.rdheader(record_path)
+    for start in range(0, header.sig_len, chunk_size):
+        signals, _ = wfdb.rdsamp(record_path, sampfrom=start, sampto=min(start + chunk_size, header.sig_len))
+        yield ECGSignal(signals, header.fs)
+
+def _at_model_rate(chunks, fs_in=None):
+    """
+    Re-yields `chunks` (ECGSignal, or arrays sampled at fs_in) as arrays at MODEL_FS.
+    """
+    resampler = None
+    for chunk in chunks:
+        chunk_fs = chunk.fs if isinstance(chunk, ECGSignal) else (fs_in or MODEL_FS)
+        data = chunk.data if isinstance(chunk, ECGSignal) else chunk
+        if resampler is None:
+            resampler = StreamingResampler(chunk_fs, MODEL_FS)
+            source_fs = chunk_fs
+        elif chunk_fs != source_fs:
+            raise ValueError(f"Sampling rate changed mid-stream: {source_fs} -> {chunk_fs} Hz")
+        yield resampler.process_chunk(data)
+    if resampler is not None:
+        yield resampler.finish()
+
+def stream_risk(model, chunks, fs=None, window=WINDOW_SIZE, hop=HOP_SIZE, sensitivity=1.0, batch_size=16):
+    """
+    Streaming inference over an arbitrarily long recording.
+
+    `chunks` is any iterable of ECGSignal chunks, or of (time, 12) arrays sampled
+    at `fs` (default MODEL_FS). Other rates are resampled to MODEL_FS chunk by
+    chunk (see StreamingResampler). Filtering is causal with state carried across
+    chunks (see StreamingCleaner); overlapping windows of `window` samples every
+    `hop` samples (both at MODEL_FS) are z-scored and scored with the same ensemble
+    as predict_risk, `batch_size` windows per forward pass. Only the current window
+    overlap and the pending batch are held in memory.
+
+    Yields one dict per window: start, end (sample indices at MODEL_FS),
+    start_s, end_s (seconds), ai_prob, risk, bpm.
+    """
+    chunks = _at_model_rate(chunks, fs)
+    # Everything below runs at the model's rate
+    fs = MODEL_FS
+    cleaner = StreamingCleaner(sampling_rate=fs)
+    normalizer = SignalCleaner(sampling_rate=fs)
+
+    raw_pending = None       # raw samples not yet fully consumed by windows
+    filtered_pending = None  # same span, causally filtered
+    pending_start = 0        # absolute index of pending[0]
+    scored_end = 0           # absolute end of the last emitted window
+    batch = []
+
+    def score(batch):
+        starts = [b[0] for b in batch]
+        normalized = np.stack([normalizer.z_score_normalization(b[2]) for b in batch])
+        input_tensor = torch.tensor(normalized.transpose(0, 2, 1), dtype=torch.float32, device=DEVICE)
+        with torch.no_grad():
+            ai_prob = model(input_tensor).squeeze(1).cpu().numpy()
+        heuristic = np.array([analyze_st_segment(w, fs) for w in normalized])
+        bpm = np.array([_rate_metrics(_rate_peaks(b[1], fs), fs)[0] for b in batch])
+        risks = blend_risk(ai_prob, heuristic, hr_risk(bpm), sensitivity)
+        for i, start in enumerate(starts):
+            end = start + len(batch[i][1])
+            yield {
+                'start': start,
+                'end': end,
+                'start_s': start / fs,
+                'end_s': end / fs,
+                'ai_prob': float(ai_prob[i]),
+                'risk': float(risks[i]),
+                'bpm': float(bpm[i]),
+            }
+
+    for chunk in chunks:
+        chunk = np.asarray(chunk, dtype=np.float64)
+        if len(chunk) == 0: continue
+        filtered = cleaner.process_chunk(chunk)
+        if raw_pending is None:
+            raw_pending, filtered_pending = chunk, filtered
+        else:
+            raw_pending = np.concatenate([raw_pending, chunk])
+            filtered_pending = np.concatenate([filtered_pending, filtered])
+
+        while len(raw_pending) >= window:
+            batch.append((pending_start, raw_pending[:window].copy(), filtered_pending[:window].copy()))
+            scored_end = pending_start + window
+            raw_pending, filtered_pending = raw_pending[hop:], filtered_pending[hop:]
+            pending_start += hop
+            if len(batch) == batch_size:
+                yield from score(batch)
+                batch = []
+
+    if batch:
+        yield from score(batch)
+
+    # Tail not covered by a full window: score the last (shorter) window on its own
+    if raw_pending is not None and pending_start + len(raw_pending) > scored_end and len(raw_pending) >= 50:
+        yield from score([(pending_start, raw_pending, filtered_pending)])
+
+def summarize(windows):
+    """
+    Aggregates per-window results into a recording-level summary.
+    """
+    risks = np.array([w['risk'] for w in windows])
+    if len(risks) == 0:
+        return {'windows': 0, 'max_risk': 0.0, 'mean_risk': 0.0, 'high_risk_windows': 0}
+    return {
+        'windows': len(risks),
+        'max_risk': float(risks.max()),
+        'mean_risk': float(risks.mean()),
+        'high_risk_windows': int((risks > 0.5).sum()),
+    }
+
+if __name__ == "__main__":
+    from src.modules.ecg_processor import load_model
+
+    parser = argparse.ArgumentParser(description="Streaming risk scoring for long (Holter) recordings.")
+    parser.add_argument("path", help="CSV file or WFDB record path (without extension)")
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--hop", type=int, default=HOP_SIZE, help=f"Window hop in samples at {MODEL_FS} Hz")
+    parser.add_argument("--fs", type=int, default=MODEL_FS, help="Sampling rate of a CSV input (WFDB records carry their own)")
+    args = parser.parse_args()
+
+    model = load_model()
+    if model is None:
+        sys.exit("Model not available.")
+
+    if args.path.endswith(".csv"):
+        chunks = iter_csv_chunks(args.path, args.chunk_size, fs=args.fs)
+    else:
+        chunks = iter_wfdb_chunks(args.path, args.chunk_size)
+
+    results = []
+    for w in stream_risk(model, chunks, hop=args.hop):
+        print(f"[{w['start_s']:8.1f}s - {w['end_s']:8.1f}s] risk {w['risk']:.2f} (AI {w['ai_prob']:.2f}, {w['bpm']:.0f} BPM)")
+        results.append({'risk': w['risk']})
+    print(summarize(results))
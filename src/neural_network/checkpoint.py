@@ -0,0 +1,141 @@
+import os
+import glob
+import queue
+import random
+import shutil
+import threading
+import numpy as np
+import torch
+
+CHECKPOINT_PATTERN = 'epoch_{:04d}.pt'
+BEST_NAME = 'best.pt'
+
+def _to_cpu(obj):
+    """
+    Detached CPU copy of a (nested) state dict, so training can keep mutating the originals.
+    """
+    if torch.is_tensor(obj):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {k: _to_cpu(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_to_cpu(v) for v in obj)
+    return obj
+
+def _atomic_save(obj, path):
+    tmp_path = path + '.tmp'
+    torch.save(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+def _atomic_copy(src, dst):
+    tmp_path = dst + '.tmp'
+    shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+def capture_rng_state():
+    state = {
+        'torch': torch.get_rng_state(),
+        'numpy': np.random.get_state(),
+        'python': random.getstate(),
+    }
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+def restore_rng_state(state):
+    torch.set_rng_state(state['torch'])
+    np.random.set_state(state['numpy'])
+    random.setstate(state['python'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+class CheckpointManager:
+    """
+    Writes full training checkpoints from a background thread.
+
+    save() snapshots the state to CPU on the caller's thread (cheap) and queues
+    the write; the thread serializes it to a temporary file and renames it into
+    place, so a crash never leaves a truncated checkpoint. The last `keep_last`
+    epoch checkpoints are kept, plus best.pt.
+    """
+    def __init__(self, directory, keep_last=3):
+        if keep_last < 1:
+            # Pruning would otherwise delete the checkpoint that was just written
+            raise ValueError(f"keep_last must be at least 1, got {keep_last}")
+        self.directory = directory
+        self.keep_last = keep_last
+        os.makedirs(directory, exist_ok=True)
+        # At most two snapshots waiting: bounds memory if the disk is slow
+        self._queue = queue.Queue(maxsize=2)
+        self._error = None
+        self._thread = threading.Thread(target=self._writer, name='checkpoint-writer', daemon=True)
+        self._thread.start()
+
+    def _writer(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._write(*job)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _write(self, state, epoch, is_best, export_path):
+        path = os.path.join(self.directory, CHECKPOINT_PATTERN.format(epoch))
+        _atomic_save(state, path)
+        if is_best:
+            _atomic_copy(path, os.path.join(self.directory, BEST_NAME))
+            if export_path:
+                # Plain state_dict, the format load_model() expects
+                _atomic_save(state['model'], export_path)
+        checkpoints = self.checkpoints()
+        for old in checkpoints[:max(len(checkpoints) - self.keep_last, 0)]:
+            os.remove(old)
+
+    def _raise_pending_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError(f"Checkpoint write failed: {error}") from error
+
+    def save(self, state, epoch, is_best=False, export_path=None):
+        """
+        Queues a checkpoint of `state` for `epoch` (and best.pt / export_path if is_best).
+        """
+        self._raise_pending_error()
+        self._queue.put((_to_cpu(state), epoch, is_best, export_path))
+
+    def wait(self):
+        """
+        Blocks until every queued checkpoint is on disk.
+        """
+        self._queue.join()
+        self._raise_pending_error()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_pending_error()
+
+    def checkpoints(self):
+        return list_checkpoints(self.directory)
+
+    def latest(self):
+        return latest_checkpoint(self.directory)
+
+def list_checkpoints(directory):
+    """
+    Epoch checkpoints in `directory`, oldest first.
+    """
+    return sorted(glob.glob(os.path.join(directory, CHECKPOINT_PATTERN.replace('{:04d}', '[0-9]*'))))
+
+def latest_checkpoint(directory):
+    paths = list_checkpoints(directory)
+    return paths[-1] if paths else None
+
+def load_checkpoint(path, map_location='cpu'):
+    # Checkpoints hold numpy / python RNG state, so the full unpickler is needed
+    return torch.load(path, map_location=map_location, weights_only=False)
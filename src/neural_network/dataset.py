@@ -1,92 +1,197 @@
 import torch
 from torch.utils.data import Dataset
+from torch.utils.data.dataloader import default_collate
 import numpy as np
-import pickle
 import os
+import json
 
-class RandomNoise(object):
+from src.preprocessing.label_encoder import load_label_matrix
+from src.preprocessing.resampling import MODEL_FS, resample
+
+# --- Batch-level augmentation ---
+# Each transform takes a (batch, channels, time) tensor and a torch.Generator.
+
+class BatchRandomNoise(object):
     def __init__(self, noise_level=0.05):
         self.noise_level = noise_level
 
-    def __call__(self, signal):
-        noise = torch.randn_like(signal) * self.noise_level
-        return signal + noise
+    def __call__(self, signals, generator):
+        noise = torch.randn(signals.shape, generator=generator, dtype=signals.dtype)
+        return signals + noise * self.noise_level
 
-class RandomShift(object):
+class BatchRandomShift(object):
+    """
+    Per-sample circular shift in [-shift_max, shift_max), done as one gather.
+    """
     def __init__(self, shift_max=50):
         self.shift_max = shift_max
 
-    def __call__(self, signal):
-        shift = np.random.randint(-self.shift_max, self.shift_max)
-        return torch.roll(signal, shift, dims=1)
-
-class Compose(object):
-    def __init__(self, transforms):
+    def __call__(self, signals, generator):
+        batch, channels, length = signals.shape
+        shifts = torch.randint(-self.shift_max, self.shift_max, (batch, 1), generator=generator)
+        # Same as torch.roll per sample: out[t] = x[t - shift]
+        index = (torch.arange(length) - shifts) % length
+        return torch.gather(signals, 2, index.unsqueeze(1).expand(batch, channels, length))
+
+class BatchAmplitudeScale(object):
+    def __init__(self, low=0.8, high=1.2):
+        self.low = low
+        self.high = high
+
+    def __call__(self, signals, generator):
+        scale = torch.empty((signals.shape[0], 1, 1), dtype=signals.dtype).uniform_(self.low, self.high, generator=generator)
+        return signals * scale
+
+class BatchBaselineWander(object):
+    """
+    Adds a slow sinusoidal drift (random frequency and phase per sample) to all leads.
+    """
+    def __init__(self, amplitude=0.1, max_freq=0.5, sampling_rate=500):
+        self.amplitude = amplitude
+        self.max_freq = max_freq
+        self.sampling_rate = sampling_rate
+
+    def __call__(self, signals, generator):
+        batch, _, length = signals.shape
+        freq = torch.rand((batch, 1, 1), generator=generator) * self.max_freq
+        phase = torch.rand((batch, 1, 1), generator=generator) * 2 * np.pi
+        t = torch.arange(length, dtype=torch.float32) / self.sampling_rate
+        drift = self.amplitude * torch.sin(2 * np.pi * freq * t + phase)
+        return signals + drift.to(signals.dtype)
+
+class BatchLeadDropout(object):
+    """
+    Zeroes each lead of each sample with probability p.
+    """
+    def __init__(self, p=0.1):
+        self.p = p
+
+    def __call__(self, signals, generator):
+        keep = torch.rand((signals.shape[0], signals.shape[1], 1), generator=generator) >= self.p
+        return signals * keep.to(signals.dtype)
+
+class BatchAugment(object):
+    """
+    DataLoader collate_fn: stacks the samples, then applies the batch transforms once.
+
+    Randomness comes from a private torch.Generator. Inside a DataLoader worker it is
+    seeded from the worker's seed (different per worker, reproducible under a fixed
+    loader seed); in the main process from `seed`, or torch's initial seed.
+    """
+    def __init__(self, transforms, seed=None):
         self.transforms = transforms
-
-    def __call__(self, signal):
+        self.seed = seed
+        self._generator = None
+        self._worker_id = None
+
+    def generator(self):
+        info = torch.utils.data.get_worker_info()
+        worker_id = info.id if info is not None else -1
+        if self._generator is None or self._worker_id != worker_id:
+            if info is not None:
+                seed = info.seed
+            else:
+                seed = self.seed if self.seed is not None else torch.initial_seed()
+            self._generator = torch.Generator()
+            self._generator.manual_seed(seed)
+            self._worker_id = worker_id
+        return self._generator
+
+    def __call__(self, samples):
+        signals, labels = default_collate(samples)
+        generator = self.generator()
         for t in self.transforms:
-            signal = t(signal)
-        return signal
+            signals = t(signals, generator)
+        return signals, labels
+
+def recorded_fs(data_path):
+    """
+    Sampling rate prepare_dataset wrote next to X_data.npy, or None for older outputs.
+    """
+    report_path = os.path.join(os.path.dirname(data_path), 'preprocess_report.json')
+    try:
+        with open(report_path) as f:
+            return json.load(f).get('fs')
+    except (OSError, ValueError):
+        return None
 
 class ECGDataset(Dataset):
-    def __init__(self, data_path, labels_path, transform=None):
+    def __init__(self, data_path, labels_path, transform=None, mmap=True, channels_first=None,
+                 target='MI', scp_statements_path=None, fs=MODEL_FS):
         """
         Args:
             data_path (str): Path to the .npy file containing signal data.
             labels_path (str): Path to the .pkl file containing labels.
             transform (callable, optional): Optional transform to be applied on a sample.
+                Prefer ECGSubset(dataset, indices, transform) to give train/val their own
+                transforms on top of one shared dataset.
+            mmap (bool): Memory-map the signal array instead of reading it into RAM.
+            channels_first (bool, optional): Layout of the array, (N, 12, time) if True,
+                (N, time, 12) if False. Detected from the shape when None.
+            target (str, optional): PTB-XL superclass to predict (NORM, MI, STTC, CD, HYP),
+                or None for the full multi-hot vector.
+            scp_statements_path (str, optional): PTB-XL scp_statements.csv overriding the
+                built-in SCP code -> superclass table.
+            fs (int, optional): Sampling rate samples are served at. Data stored at another
+                rate (recorded by prepare_dataset in preprocess_report.json, e.g. 100 Hz
+                for records100) is resampled per sample on read; None serves it as stored.
         """
-        self.X = np.load(data_path)
-
-        with open(labels_path, 'rb') as f:
-            self.y_raw = pickle.load(f)
-
-        # Process labels: Convert dicts to multi-hot encoding or single class
-        # For this example, let's assume we want to detect if 'MI' (Myocardial Infarction) is present.
-        # This is a simplification. In a real project, you'd map all SCP codes to classes.
-        self.y = self._process_labels(self.y_raw)
+        # Outputs without a recorded rate predate --fs and are at the model's rate
+        self.stored_fs = recorded_fs(data_path) or MODEL_FS
+        self.fs = fs or self.stored_fs
+        self.X = np.load(data_path, mmap_mode='r' if mmap else None)
+        if channels_first is None:
+            channels_first = self.X.shape[-1] != 12 and self.X.shape[1] == 12
+        self.channels_first = channels_first
+
+        # Multi-hot superclass matrix, cached next to the data and reused
+        # until y_labels.pkl changes (see label_encoder.load_label_matrix)
+        self.labels, self.classes = load_label_matrix(labels_path, scp_statements_path)
+        self.target = target
+        if target is None:
+            # All superclasses, for multi-label training
+            self.y = torch.from_numpy(self.labels.astype(np.float32))
+        else:
+            self.y = torch.from_numpy(self.labels[:, self.classes.index(target)].astype(np.float32))
 
         self.transform = transform
 
-    def _process_labels(self, raw_labels):
-        """
-        Convert list of dicts to a binary tensor for a specific condition (e.g., MI).
-        """
-        # Example: Target class 'MI' (Myocardial Infarction)
-        # PTB-XL superclasses: NORM, MI, STTC, CD, HYP
-        # We need to map the specific SCP codes to these superclasses usually.
-        # For this MVP, let's look for 'MI' in the keys or values.
-
-        # NOTE: In a real scenario, you need the 'scp_statements.csv' to map codes to superclasses.
-        # Here we will just create dummy labels or look for a specific string if available.
-        # Let's create a dummy target: 1 if 'MI' is in the dict keys, 0 otherwise.
-
-        targets = []
-        for label_dict in raw_labels:
-            # Check if any key contains 'MI' (very naive approach)
-            is_mi = 0
-            for key in label_dict.keys():
-                if 'MI' in key:
-                    is_mi = 1
-                    break
-            targets.append(is_mi)
-
-        return torch.tensor(targets, dtype=torch.float32)
-
     def __len__(self):
         return len(self.X)
 
     def __getitem__(self, idx):
-        # Shape: (time, channels) -> PyTorch expects (channels, time) for 1D Conv
+        # PyTorch expects (channels, time) for 1D Conv
         signal = self.X[idx]
+        if not self.channels_first:
+            signal = signal.transpose(1, 0)
+        if self.fs != self.stored_fs:
+            signal = resample(signal, self.stored_fs, self.fs, axis=1)
+
+        # Single copy out of the (read-only) map into a float32 tensor;
+        # for a channel-first float32 file that copy is all the work done
+        signal_tensor = torch.from_numpy(np.array(signal, dtype=np.float32, order='C'))
+        label_tensor = self.y[idx]
 
-        # Transpose to (channels, time)
-        signal = signal.transpose(1, 0)
+        if self.transform:
+            signal_tensor = self.transform(signal_tensor)
 
-        # Convert to tensor
-        signal_tensor = torch.tensor(signal, dtype=torch.float32)
-        label_tensor = self.y[idx]
+        return signal_tensor, label_tensor
+
+class ECGSubset(Dataset):
+    """
+    View of an ECGDataset restricted to `indices`, with its own transform.
+    All subsets share the parent's (memory-mapped) array and labels.
+    """
+    def __init__(self, dataset, indices, transform=None):
+        self.dataset = dataset
+        self.indices = indices
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, idx):
+        signal_tensor, label_tensor = self.dataset[self.indices[idx]]
 
         if self.transform:
             signal_tensor = self.transform(signal_tensor)
@@ -0,0 +1,41 @@
+import copy as _copy
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+from src.neural_network.model import CNNLSTM, ResidualBlock
+
+def _fuse_pair(owner, conv_name, bn_name):
+    # BN becomes Identity so forward() keeps working unchanged
+    conv, bn = getattr(owner, conv_name), getattr(owner, bn_name)
+    setattr(owner, conv_name, fuse_conv_bn_eval(conv, bn))
+    setattr(owner, bn_name, nn.Identity())
+
+def fuse_residual_block(block):
+    _fuse_pair(block, 'conv1', 'bn1')
+    _fuse_pair(block, 'conv2', 'bn2')
+    if block.downsample is not None:
+        # Sequential(conv, bn) -> the folded conv alone
+        block.downsample = fuse_conv_bn_eval(block.downsample[0], block.downsample[1])
+    return block
+
+def fuse_model(model, copy=True):
+    """
+    Returns an inference-only CNNLSTM with every Conv1d/BatchNorm1d pair
+    folded into one Conv1d (BN's running statistics and affine become the conv's
+    weight scale and bias).
+
+    With copy=True the input model is left untouched; copy=False folds in place,
+    so the untouched LSTM / attention / classifier weights keep their storage
+    (e.g. a memory-mapped checkpoint) and no second full model is ever held.
+
+    The ReLUs stay separate: eager PyTorch has no fused float conv+ReLU kernel,
+    and they already run in place.
+    """
+    if not isinstance(model, CNNLSTM):
+        raise TypeError(f"expected a CNNLSTM, got {type(model).__name__}")
+    fused = (_copy.deepcopy(model) if copy else model).eval()
+    _fuse_pair(fused, 'conv1', 'bn1')
+    for module in fused.modules():
+        if isinstance(module, ResidualBlock):
+            fuse_residual_block(module)
+    return fused
@@ -1,6 +1,27 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
+
+def output_lengths(lengths, layer):
+    """
+    Valid output length of a Conv1d / MaxPool1d for inputs of valid length `lengths`.
+    """
+    def _int(v):
+        return v[0] if isinstance(v, tuple) else v
+    kernel, stride = _int(layer.kernel_size), _int(layer.stride)
+    padding, dilation = _int(layer.padding), _int(layer.dilation)
+    return (lengths + 2 * padding - dilation * (kernel - 1) - 1) // stride + 1
+
+def mask_padding(x, lengths):
+    """
+    Zeroes the time steps of x (batch, channels, time) at or beyond each item's length,
+    so the next convolution sees exactly the zero padding an unpadded input would get.
+    """
+    if lengths is None:
+        return x
+    steps = torch.arange(x.shape[-1], device=x.device)
+    return x * (steps < lengths.unsqueeze(1)).unsqueeze(1).to(x.dtype)
 
 class ResidualBlock(nn.Module):
     def __init__(self, in_channels, out_channels, stride=1):
@@ -18,11 +39,15 @@ class ResidualBlock(nn.Module):
                 nn.BatchNorm1d(out_channels)
             )
 
-    def forward(self, x):
+    def forward(self, x, lengths=None):
+        # lengths: valid time steps of x (already masked); padding is re-masked after each stage
         identity = x
         out = self.conv1(x)
         out = self.bn1(out)
         out = self.relu(out)
+        if lengths is not None:
+            lengths = output_lengths(lengths, self.conv1)
+            out = mask_padding(out, lengths)
         out = self.conv2(out)
         out = self.bn2(out)
         
@@ -31,10 +56,15 @@ class ResidualBlock(nn.Module):
             
         out += identity
         out = self.relu(out)
+        if lengths is not None:
+            return mask_padding(out, lengths), lengths
         return out
 
 class CNNLSTM(nn.Module):
-    def __init__(self, input_channels=12, num_classes=1):
+    # forward() accepts padded ragged batches via `lengths`
+    supports_lengths = True
+
+    def __init__(self, input_channels=12, num_classes=1, dropout=0.5):
         super(CNNLSTM, self).__init__()
         
         # Enhanced CNN Encoder (ResNet-style)
@@ -50,7 +80,7 @@ class CNNLSTM(nn.Module):
         # LSTM for temporal dependencies
         # Input features: 256 (from CNN)
         # Reverted dropout to 0.5 for better confidence
-        self.lstm = nn.LSTM(input_size=256, hidden_size=128, num_layers=2, batch_first=True, dropout=0.5, bidirectional=True)
+        self.lstm = nn.LSTM(input_size=256, hidden_size=128, num_layers=2, batch_first=True, dropout=dropout, bidirectional=True)
         
         # Attention Mechanism
         self.attention = nn.Linear(128 * 2, 1)
@@ -60,38 +90,83 @@ class CNNLSTM(nn.Module):
         self.fc = nn.Sequential(
             nn.Linear(128 * 2, 64),
             nn.ReLU(),
-            nn.Dropout(0.5), # Reverted dropout
+            nn.Dropout(dropout), # Reverted dropout
             nn.Linear(64, num_classes),
             nn.Sigmoid()
         )
 
-    def forward(self, x):
+    def forward(self, x, return_logits=False, lengths=None):
         # x shape: (batch, 12, 5000)
-        
-        # CNN Feature Extraction
-        x = self.conv1(x)
-        x = self.bn1(x)
-        x = self.relu(x)
-        x = self.maxpool(x)
-        
-        x = self.layer1(x)
-        x = self.layer2(x)
-        x = self.layer3(x)
-        # Output shape: (batch, 256, reduced_time)
-        
+        # return_logits=True skips the final Sigmoid (for BCEWithLogitsLoss / autocast)
+        # lengths: (batch,) valid samples per item when x is a zero-padded ragged batch
+        if lengths is None:
+            return self.classify(self.features(x), return_logits)
+        x, lengths = self.features(x, lengths)
+        return self.classify(x, return_logits, lengths)
+
+    def features(self, x, lengths=None):
+        """
+        CNN encoder: (batch, 12, time) -> (batch, 256, reduced_time).
+        With `lengths`, also returns the valid reduced lengths.
+        """
+        if lengths is None:
+            # CNN Feature Extraction
+            x = self.conv1(x)
+            x = self.bn1(x)
+            x = self.relu(x)
+            x = self.maxpool(x)
+            
+            x = self.layer1(x)
+            x = self.layer2(x)
+            x = self.layer3(x)
+            # Output shape: (batch, 256, reduced_time)
+            return x
+
+        # Same stack, with the padding re-zeroed after every stage. Post-ReLU values are
+        # >= 0, so zeroed padding never wins a max-pool window either.
+        lengths = torch.as_tensor(lengths, device=x.device)
+        x = mask_padding(x, lengths)
+        x = self.relu(self.bn1(self.conv1(x)))
+        lengths = output_lengths(lengths, self.conv1)
+        x = self.maxpool(mask_padding(x, lengths))
+        lengths = output_lengths(lengths, self.maxpool)
+        x = mask_padding(x, lengths)
+        for layer in (self.layer1, self.layer2, self.layer3):
+            x, lengths = layer(x, lengths)
+        return x, lengths
+
+    def classify(self, x, return_logits=False, lengths=None):
+        """
+        BiLSTM + attention pooling + classifier on encoder features.
+        With `lengths`, the LSTM runs on packed sequences and padded steps get no attention.
+        """
         # Prepare for LSTM: (batch, time, features)
         x = x.permute(0, 2, 1)
         
         # LSTM
         # out: (batch, seq_len, num_directions * hidden_size)
-        self.lstm.flatten_parameters()
-        out, _ = self.lstm(x)
+        # Dynamically quantized LSTMs have no cuDNN weights to flatten
+        if isinstance(self.lstm, nn.LSTM):
+            self.lstm.flatten_parameters()
+        if lengths is None:
+            out, _ = self.lstm(x)
+        else:
+            packed = pack_padded_sequence(x, lengths.cpu(), batch_first=True, enforce_sorted=False)
+            out, _ = self.lstm(packed)
+            out, _ = pad_packed_sequence(out, batch_first=True, total_length=x.shape[1])
         
         # Attention Mechanism
-        attn_weights = F.softmax(self.attention(out), dim=1)
+        scores = self.attention(out)
+        if lengths is not None:
+            steps = torch.arange(out.shape[1], device=out.device)
+            padded = steps.unsqueeze(0) >= lengths.to(out.device).unsqueeze(1)
+            scores = scores.masked_fill(padded.unsqueeze(-1), float('-inf'))
+        attn_weights = F.softmax(scores, dim=1)
         out = torch.sum(attn_weights * out, dim=1)
         
-        # Classification
-        out = self.fc(out)
+        # Classification (fc[-1] is the Sigmoid)
+        out = self.fc[:-1](out)
+        if return_logits:
+            return out
         
-        return out
+        return self.fc[-1](out)
@@ -0,0 +1,150 @@
+import os
+import numpy as np
+import torch
+
+from src.neural_network.model import CNNLSTM
+from src.neural_network.fusion import fuse_model
+from src.neural_network.student import StudentCNN
+
+# Inference backends for load_model: eager PyTorch, TorchScript, ONNX Runtime (CPU), INT8 TorchScript (CPU),
+# and the distilled triage student (eager PyTorch)
+BACKENDS = ('eager', 'torchscript', 'onnx', 'int8', 'student')
+BACKEND_ENV = 'ECG_MODEL_BACKEND'
+PARITY_ATOL = 1e-4
+
+def artifact_paths(weights_path):
+    """
+    Export locations next to the state dict: saved_model.ts.pt, saved_model.onnx, saved_model.int8.pt,
+    saved_model.student.pth.
+    """
+    stem = os.path.splitext(weights_path)[0]
+    return {'torchscript': stem + '.ts.pt', 'onnx': stem + '.onnx', 'int8': stem + '.int8.pt',
+            'student': stem + '.student.pth'}
+
+def default_backend():
+    backend = os.environ.get(BACKEND_ENV, 'eager').lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"{BACKEND_ENV} must be one of {BACKENDS}, got '{backend}'")
+    return backend
+
+class OnnxModel:
+    """
+    ONNX Runtime session behind the CNNLSTM call interface:
+    model(tensor of shape (batch, 12, time)) -> tensor of probabilities (batch, 1).
+    Inference only; there are no gradients, so saliency is unavailable.
+    """
+    supports_grad = False
+
+    def __init__(self, path, threads=None):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.path = path
+        self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        x = x.detach().cpu().numpy() if torch.is_tensor(x) else np.asarray(x)
+        out = self.session.run(None, {self.input_name: np.ascontiguousarray(x, dtype=np.float32)})[0]
+        return torch.from_numpy(out)
+
+    def eval(self):
+        return self
+
+    def to(self, device):
+        return self
+
+def _load_state(model, path, device):
+    on_cpu = torch.device(device).type == 'cpu'
+    # Plain tensors only (no pickled code); on CPU the file is memory-mapped and the
+    # parameters point straight at it (assign=True), so nothing is copied up front
+    state = torch.load(path, map_location=device, weights_only=True, mmap=on_cpu)
+    model.load_state_dict(state, assign=on_cpu)
+    return model.to(device).eval()
+
+def load_backend(backend, weights_path, device='cpu', fuse=True):
+    """
+    Loads the model for `backend`. TorchScript / ONNX artifacts come from src/export_model.py,
+    the INT8 one from src/quantize_model.py, the student from src/distill_model.py.
+    The eager model is served with Conv+BN folded (fuse=True) unless asked otherwise.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+    if backend == 'eager':
+        model = _load_state(CNNLSTM(input_channels=12, num_classes=1), weights_path, device)
+        # Folded in place: only the conv weights are recomputed, the rest stay memory-mapped
+        return fuse_model(model, copy=False) if fuse else model
+
+    path = artifact_paths(weights_path)[backend]
+    if not os.path.exists(path):
+        script = {'int8': 'quantize_model.py', 'student': 'distill_model.py'}.get(backend, 'export_model.py')
+        raise FileNotFoundError(f"{path} not found; run src/{script} first")
+    if backend == 'student':
+        return _load_state(StudentCNN(input_channels=12, num_classes=1), path, device)
+    if backend == 'int8':
+        # Quantized kernels are CPU-only and have no autograd: like OnnxModel, report
+        # supports_grad=False so saliency returns None instead of failing
+        model = torch.jit.load(path, map_location='cpu').eval()
+        model.supports_grad = False
+        return model
+    if backend == 'torchscript':
+        return torch.jit.load(path, map_location=device).eval()
+    return OnnxModel(path)
+
+def check_parity(reference, candidate, shapes=((1, 12, 5000), (4, 12, 5000), (2, 12, 3000)), atol=PARITY_ATOL, seed=0):
+    """
+    Max absolute difference between reference and candidate outputs on random
+    inputs of several shapes. Raises AssertionError above `atol`.
+    """
+    generator = torch.Generator().manual_seed(seed)
+    worst = 0.0
+    with torch.inference_mode():
+        for shape in shapes:
+            x = torch.randn(*shape, generator=generator)
+            expected = reference(x).cpu().numpy()
+            actual = candidate(x).cpu().numpy()
+            if expected.shape != actual.shape:
+                raise AssertionError(f"shape mismatch for input {shape}: {expected.shape} vs {actual.shape}")
+            worst = max(worst, float(np.abs(expected - actual).max()))
+    if worst > atol:
+        raise AssertionError(f"max abs diff {worst:.2e} exceeds {atol:.0e}")
+    return worst
+
+def mapped_ranges(path):
+    """
+    Address ranges of this process's memory mappings of `path` (Linux only; empty elsewhere).
+    """
+    path = os.path.realpath(path)
+    ranges = []
+    if not os.path.exists('/proc/self/maps'):
+        return ranges
+    with open('/proc/self/maps') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 6 and parts[5] == path:
+                start, end = (int(v, 16) for v in parts[0].split('-'))
+                ranges.append((start, end))
+    return ranges
+
+def check_mmap(model, weights_path):
+    """
+    Asserts that an eager model loaded on CPU still reads its weights from the
+    checkpoint's memory map. Conv weights are exempt: Conv+BN folding computes new ones.
+    Returns (mapped, checked) parameter counts, or None where /proc/self/maps is unavailable.
+    """
+    if not os.path.exists('/proc/self/maps'):
+        return None
+    ranges = mapped_ranges(weights_path)
+    checked = mapped = 0
+    for module in model.modules():
+        if isinstance(module, torch.nn.Conv1d):
+            continue
+        for name, param in module.named_parameters(recurse=False):
+            checked += 1
+            if any(start <= param.data_ptr() < end for start, end in ranges):
+                mapped += 1
+            else:
+                raise AssertionError(f"{type(module).__name__}.{name} is not backed by {weights_path}")
+    return mapped, checked
@@ -0,0 +1,58 @@
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+# (out_channels, stride) per depthwise-separable block; 500 Hz input is reduced 32x
+STUDENT_BLOCKS = ((32, 2), (64, 2), (64, 1), (128, 2), (128, 2))
+
+class SeparableBlock(nn.Module):
+    """
+    Depthwise Conv1d (one filter per channel) + pointwise 1x1 Conv1d, each with BN and ReLU.
+    """
+    def __init__(self, in_channels, out_channels, kernel_size=9, stride=1):
+        super(SeparableBlock, self).__init__()
+        self.depthwise = nn.Conv1d(in_channels, in_channels, kernel_size, stride=stride,
+                                   padding=kernel_size // 2, groups=in_channels, bias=False)
+        self.bn1 = nn.BatchNorm1d(in_channels)
+        self.pointwise = nn.Conv1d(in_channels, out_channels, kernel_size=1, bias=False)
+        self.bn2 = nn.BatchNorm1d(out_channels)
+        self.relu = nn.ReLU(inplace=True)
+
+    def forward(self, x):
+        x = self.relu(self.bn1(self.depthwise(x)))
+        return self.relu(self.bn2(self.pointwise(x)))
+
+class StudentCNN(nn.Module):
+    """
+    Compact triage model distilled from CNNLSTM (see src/distill_model.py):
+    a depthwise-separable CNN with attention pooling over time, no recurrence.
+    Same call interface as CNNLSTM: (batch, 12, time) -> (batch, num_classes) probabilities.
+    """
+    def __init__(self, input_channels=12, num_classes=1, dropout=0.2, blocks=STUDENT_BLOCKS):
+        super(StudentCNN, self).__init__()
+        stem_channels = blocks[0][0]
+        self.stem = nn.Sequential(
+            nn.Conv1d(input_channels, stem_channels, kernel_size=7, stride=2, padding=3, bias=False),
+            nn.BatchNorm1d(stem_channels),
+            nn.ReLU(inplace=True)
+        )
+        layers = []
+        channels = stem_channels
+        for out_channels, stride in blocks:
+            layers.append(SeparableBlock(channels, out_channels, stride=stride))
+            channels = out_channels
+        self.blocks = nn.Sequential(*layers)
+
+        # Attention pooling: one score per time step, softmax over time
+        self.attention = nn.Conv1d(channels, 1, kernel_size=1)
+        self.dropout = nn.Dropout(dropout)
+        self.fc = nn.Linear(channels, num_classes)
+
+    def forward(self, x, return_logits=False):
+        x = self.blocks(self.stem(x))
+        weights = F.softmax(self.attention(x), dim=2)
+        x = torch.sum(weights * x, dim=2)
+        logits = self.fc(self.dropout(x))
+        if return_logits:
+            return logits
+        return torch.sigmoid(logits)
@@ -0,0 +1,101 @@
+import numpy as np
+import hashlib
+import json
+import os
+import pickle
+from itertools import chain
+
+# PTB-XL diagnostic superclasses, in column order of the label matrix
+SUPERCLASSES = ('NORM', 'MI', 'STTC', 'CD', 'HYP')
+
+# Diagnostic SCP statement -> superclass, as in PTB-XL's scp_statements.csv
+SCP_SUPERCLASS = {
+    'NORM': 'NORM',
+    # Myocardial infarction
+    'IMI': 'MI', 'ASMI': 'MI', 'ILMI': 'MI', 'AMI': 'MI', 'ALMI': 'MI', 'INJAS': 'MI', 'LMI': 'MI',
+    'INJAL': 'MI', 'IPLMI': 'MI', 'IPMI': 'MI', 'INJIN': 'MI', 'INJLA': 'MI', 'PMI': 'MI', 'INJIL': 'MI',
+    # ST/T change
+    'NDT': 'STTC', 'NST_': 'STTC', 'DIG': 'STTC', 'LNGQT': 'STTC', 'ISC_': 'STTC', 'ISCAL': 'STTC',
+    'ISCIN': 'STTC', 'ISCIL': 'STTC', 'ISCAS': 'STTC', 'ISCLA': 'STTC', 'ANEUR': 'STTC', 'EL': 'STTC',
+    'ISCAN': 'STTC',
+    # Conduction disturbance
+    'LAFB': 'CD', 'IRBBB': 'CD', '1AVB': 'CD', 'IVCD': 'CD', 'CRBBB': 'CD', 'CLBBB': 'CD', 'LPFB': 'CD',
+    'WPW': 'CD', 'ILBBB': 'CD', '3AVB': 'CD', '2AVB': 'CD',
+    # Hypertrophy
+    'LVH': 'HYP', 'LAO/LAE': 'HYP', 'RVH': 'HYP', 'RAO/RAE': 'HYP', 'SEHYP': 'HYP',
+}
+
+CACHE_NAME = 'y_multihot.npz'
+
+def load_scp_mapping(scp_statements_path):
+    """
+    Reads the code -> superclass table from PTB-XL's scp_statements.csv.
+    """
+    import pandas as pd
+    df = pd.read_csv(scp_statements_path, index_col=0)
+    df = df[df['diagnostic'] == 1]
+    return df['diagnostic_class'].dropna().to_dict()
+
+def encode_labels(raw_labels, mapping=SCP_SUPERCLASS, classes=SUPERCLASSES):
+    """
+    Converts a sequence of SCP-code dicts into a (N, len(classes)) multi-hot uint8 matrix.
+
+    The codes are flattened once; each distinct code is looked up a single time
+    and the matrix is filled with one fancy-index assignment.
+    """
+    n = len(raw_labels)
+    matrix = np.zeros((n, len(classes)), dtype=np.uint8)
+    counts = np.fromiter((len(d) if d else 0 for d in raw_labels), dtype=np.int64, count=n)
+    if counts.sum() == 0:
+        return matrix
+
+    codes = np.array(list(chain.from_iterable(d.keys() for d in raw_labels if d)), dtype=str)
+    rows = np.repeat(np.arange(n), counts)
+
+    class_index = {c: i for i, c in enumerate(classes)}
+    unique_codes, inverse = np.unique(codes, return_inverse=True)
+    lookup = np.array([class_index.get(mapping.get(code), -1) for code in unique_codes])
+    columns = lookup[inverse]
+    known = columns >= 0
+    matrix[rows[known], columns[known]] = 1
+    return matrix
+
+def _file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def _cache_key(labels_path, mapping, classes):
+    mapping_key = json.dumps([sorted(mapping.items()), list(classes)])
+    return _file_hash(labels_path) + ':' + hashlib.sha256(mapping_key.encode()).hexdigest()
+
+def load_label_matrix(labels_path, scp_statements_path=None, classes=SUPERCLASSES):
+    """
+    Returns (matrix, classes) for a y_labels.pkl file.
+
+    The encoded matrix is cached as y_multihot.npz in the same directory and
+    reused while the labels file (and the code mapping) are unchanged.
+    """
+    mapping = load_scp_mapping(scp_statements_path) if scp_statements_path else SCP_SUPERCLASS
+    cache_path = os.path.join(os.path.dirname(os.path.abspath(labels_path)), CACHE_NAME)
+    key = _cache_key(labels_path, mapping, classes)
+
+    if os.path.exists(cache_path):
+        try:
+            with np.load(cache_path) as cached:
+                if str(cached['key']) == key:
+                    return cached['labels'], tuple(str(c) for c in cached['classes'])
+        except Exception:
+            pass  # Unreadable cache: rebuild it
+
+    with open(labels_path, 'rb') as f:
+        raw_labels = pickle.load(f)
+    matrix = encode_labels(raw_labels, mapping, classes)
+
+    # Per-process temp name: concurrent trainers (sweeps, DDP ranks) may rebuild the cache at once
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, labels=matrix, classes=np.array(classes), key=np.array(key))
+    os.replace(tmp_path, cache_path)
+    return matrix, tuple(classes)
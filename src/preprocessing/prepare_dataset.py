@@ -7,95 +7,226 @@ project_root = os.path.dirname(os.path.dirname(current_dir))
 if project_root not in sys.path:
     sys.path.append(project_root)
 
+import argparse
+import ast
+import json
 import numpy as np
 import wfdb
 import pickle
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from src.preprocessing.signal_cleaner import SignalCleaner
+from src.preprocessing.resampling import MODEL_FS, resample, resampled_length
 
-def load_and_process_data(raw_dir, processed_dir):
-    """
-    Loads raw ECG data, cleans it, extracts labels, and saves to processed directory.
-    """
-    if not os.path.exists(processed_dir):
-        os.makedirs(processed_dir)
+# Rows copied per step when compacting the output after failed records
+COPY_BLOCK = 256
 
-    cleaner = SignalCleaner()
+# Per-worker state, set by _init_worker
+_cleaner = None
+_output = None
+_channels_first = False
+_fs = MODEL_FS
 
-    processed_data = []
-    processed_labels = []
-
-    # List all header files to identify records
+def find_records(raw_dir):
+    """
+    Lists every WFDB record (path without extension) under raw_dir.
+    """
     # We walk through the directory because download might create subfolders
     records = []
     for root, dirs, files in os.walk(raw_dir):
         for file in files:
             if file.endswith(".hea"):
-                # Get the record path relative to raw_dir or absolute,
-                # but wfdb needs the path without extension
-                full_path = os.path.join(root, file)
-                record_path = os.path.splitext(full_path)[0]
-                records.append(record_path)
+                # wfdb needs the path without extension
+                records.append(os.path.splitext(os.path.join(root, file))[0])
+    return sorted(records)
 
-    print(f"Found {len(records)} records. Processing...")
+def parse_labels(comments):
+    """
+    Extracts the SCP codes dict from the header comments.
+    PTB-XL stores them like "scp_codes: {'NORM': 100.0, 'LMI': 0.0}".
+    Returns None if the codes are present but cannot be parsed.
+    """
+    for comment in comments:
+        if comment.startswith('scp_codes:'):
+            code_str = comment.replace('scp_codes:', '').strip()
+            try:
+                return ast.literal_eval(code_str)
+            except (ValueError, SyntaxError):
+                return None
+    return {}
+
+def _read_header(record_path):
+    """
+    (samples, channels, fs) from the record's header.
+    """
+    try:
+        header = wfdb.rdheader(record_path)
+        return header.sig_len, header.n_sig, header.fs
+    except Exception:
+        return None
+
+def _init_worker(output_path, channels_first, fs):
+    global _cleaner, _output, _channels_first, _fs
+    # Cleaning always runs at the model's rate, exactly as at inference
+    _cleaner = SignalCleaner(sampling_rate=MODEL_FS)
+    _output = np.load(output_path, mmap_mode='r+')
+    _channels_first = channels_first
+    _fs = fs
+
+def _process_record(task):
+    """
+    Reads, cleans and writes one record straight into the shared output array.
+    Returns (index, labels, error, warning); only small objects travel back to the parent.
+    """
+    index, record_path = task
+    try:
+        # signals shape is (time, channels)
+        signals, fields = wfdb.rdsamp(record_path)
+        cleaned = _cleaner.process(resample(signals, fields['fs'], MODEL_FS))
+        # Stored at the output rate; ECGDataset resamples back to MODEL_FS on read
+        cleaned = resample(cleaned, MODEL_FS, _fs)
+        expected = _output.shape[:0:-1] if _channels_first else _output.shape[1:]
+        if cleaned.shape != expected:
+            raise ValueError(f"unexpected shape {cleaned.shape}, expected {expected}")
+        # Channel-first output is stored as (channels, time), ready for Conv1d
+        _output[index] = cleaned.T if _channels_first else cleaned
+    except Exception as e:
+        return index, None, f"{type(e).__name__}: {e}", None
 
-    for record_path in records:
-        try:
-            # Read signal and header
-            # sampfrom/sampto can be used to limit length, here we take full length
-            signals, fields = wfdb.rdsamp(record_path)
-
-            # Apply cleaning
-            # signals shape is (time, channels)
-            cleaned_signal = cleaner.process(signals)
-
-            # Extract labels from fields['comments']
-            # PTB-XL stores SCP codes in comments like "scp_codes: {'NORM': 100, ...}"
-            # We need to parse this string.
-            labels = {}
-            for comment in fields['comments']:
-                if comment.startswith('scp_codes:'):
-                    # Safe eval or json parse would be better, but format is python dict-like
-                    # ex: scp_codes: {'NORM': 100.0, 'LMI': 0.0}
-                    code_str = comment.replace('scp_codes:', '').strip()
-                    try:
-                        import ast
-                        labels = ast.literal_eval(code_str)
-                    except:
-                        print(f"Could not parse labels for {record_path}")
-
-            # For this MVP, let's just store the primary class (highest likelihood)
-            # or just the raw dictionary. Let's store the dict.
-
-            processed_data.append(cleaned_signal)
-            processed_labels.append(labels)
-
-        except Exception as e:
-            print(f"Error processing {record_path}: {e}")
-
-    # Convert to numpy arrays (assuming all signals have same length)
-    # PTB-XL signals are usually 10s (5000 samples at 500Hz) or similar.
-    # If lengths differ, we might need padding. PTB-XL is consistent.
+    labels = parse_labels(fields['comments'])
+    if labels is None:
+        return index, {}, None, "could not parse scp_codes"
+    return index, labels, None, None
 
-    try:
-        if len(processed_data) == 0:
-            print("No data processed. Check if raw data exists.")
-            return
+def read_raw_record(record_path, fs=MODEL_FS):
+    """
+    A record's raw (time, channels) samples, resampled to `fs` (the model's rate, at which
+    load_and_process_data cleans them).
+    """
+    signals, fields = wfdb.rdsamp(record_path)
+    return resample(signals, fields['fs'], fs)
 
-        X = np.array(processed_data)
-        # y is a list of dicts, we'll save it as an object array or pickle it
-        y = np.array(processed_labels)
+def processed_records(raw_dir, processed_dir):
+    """
+    Raw record paths in X_data.npy row order (records that failed are skipped),
+    or None when preprocess_report.json is missing or does not match.
+    """
+    report_path = os.path.join(processed_dir, 'preprocess_report.json')
+    if not os.path.exists(report_path):
+        return None
+    with open(report_path) as f:
+        report = json.load(f)
+    failed = {e['record'] for e in report.get('errors', [])}
+    records = [r for r in find_records(raw_dir) if r not in failed]
+    return records if len(records) == report.get('processed') else None
+
+def _compact(src_path, dst_path, keep):
+    """
+    Copies the rows in `keep` into a new .npy, block by block.
+    """
+    src = np.load(src_path, mmap_mode='r')
+    dst = np.lib.format.open_memmap(dst_path, mode='w+', dtype=src.dtype, shape=(len(keep),) + src.shape[1:])
+    for start in range(0, len(keep), COPY_BLOCK):
+        rows = keep[start:start + COPY_BLOCK]
+        dst[start:start + len(rows)] = src[rows]
+    dst.flush()
+    del src, dst
+
+def load_and_process_data(raw_dir, processed_dir, num_workers=None, dtype=np.float32, channels_first=False, fs=None):
+    """
+    Loads raw ECG data, cleans it, extracts labels, and saves to processed directory.
 
-        print(f"Saving processed data: X shape {X.shape}, y shape {y.shape}")
+    Records are spread over a process pool; every worker writes its cleaned
+    signals directly into a preallocated memory-mapped X_data.npy, so peak
+    memory does not grow with the dataset. Failed records are listed in
+    preprocess_report.json instead of aborting the run.
 
-        np.save(os.path.join(processed_dir, 'X_data.npy'), X)
-        # Save labels as pickle because it's a list of dicts
-        with open(os.path.join(processed_dir, 'y_labels.pkl'), 'wb') as f:
-            pickle.dump(y, f)
+    With channels_first=True, X_data.npy is laid out (N, channels, time) so
+    ECGDataset can hand samples to the model without a transpose.
 
-        print("Processing complete.")
+    Records are cleaned at the model's 500 Hz (the rate inference sees) and
+    stored at `fs`, by default the records' own header rate: records100 is kept
+    at 100 Hz, 5x smaller than upsampled storage. The rate goes into
+    preprocess_report.json, and ECGDataset resamples each sample back to
+    500 Hz on read, so training, evaluation, quantization and distillation all
+    consume either layout.
+    """
+    if not os.path.exists(processed_dir):
+        os.makedirs(processed_dir)
 
-    except Exception as e:
-        print(f"Error saving data: {e}")
+    records = find_records(raw_dir)
+    print(f"Found {len(records)} records. Processing...")
+    if len(records) == 0:
+        print("No data processed. Check if raw data exists.")
+        return
+
+    num_workers = num_workers or os.cpu_count()
+    errors = []
+    warnings = []
+
+    with ProcessPoolExecutor(max_workers=num_workers) as pool:
+        headers = [h for h in pool.map(_read_header, records, chunksize=64) if h is not None]
+    if not headers:
+        print("No readable record headers found.")
+        return
+    if fs is None:
+        # Store at the source rate: no upsampling in the saved array
+        fs = Counter(h[2] for h in headers).most_common(1)[0][0]
+    print(f"Storing signals at {fs} Hz (cleaned at {MODEL_FS} Hz).")
+
+    # PTB-XL is consistent (10s per record); other shapes are reported, not padded
+    valid_shapes = [(resampled_length(resampled_length(n, rate, MODEL_FS), MODEL_FS, fs), channels)
+                    for n, channels, rate in headers]
+    target_shape = Counter(valid_shapes).most_common(1)[0][0]
+    out_shape = target_shape[::-1] if channels_first else target_shape
+
+    x_path = os.path.join(processed_dir, 'X_data.npy')
+    tmp_path = x_path + '.partial.npy'
+    output = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=dtype, shape=(len(records),) + out_shape)
+    del output
+
+    labels = [None] * len(records)
+    ok = np.zeros(len(records), dtype=bool)
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker, initargs=(tmp_path, channels_first, fs)) as pool:
+        for index, record_labels, error, warning in pool.map(_process_record, enumerate(records), chunksize=16):
+            if error is None:
+                labels[index] = record_labels
+                ok[index] = True
+            else:
+                errors.append({'record': records[index], 'error': error})
+            if warning is not None:
+                warnings.append({'record': records[index], 'warning': warning})
+
+    keep = np.flatnonzero(ok)
+    if len(keep) == 0:
+        os.remove(tmp_path)
+        print("No data processed. Check if raw data exists.")
+    elif len(keep) == len(records):
+        os.replace(tmp_path, x_path)
+    else:
+        _compact(tmp_path, x_path, keep)
+        os.remove(tmp_path)
+
+    if len(keep) > 0:
+        # y is a list of dicts; pickle it as an object array
+        y = np.array([labels[i] for i in keep])
+        with open(os.path.join(processed_dir, 'y_labels.pkl'), 'wb') as f:
+            pickle.dump(y, f)
+        print(f"Saved processed data: X shape {(len(keep),) + out_shape}, y shape {y.shape}")
+
+    report = {
+        'records': len(records),
+        'processed': int(len(keep)),
+        'failed': len(errors),
+        'shape': [int(len(keep))] + list(out_shape),
+        'fs': fs,
+        'errors': errors,
+        'warnings': warnings,
+    }
+    with open(os.path.join(processed_dir, 'preprocess_report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Processing complete. {len(errors)} record(s) failed, see preprocess_report.json.")
 
 if __name__ == "__main__":
     # Setup paths
@@ -104,4 +235,13 @@ if __name__ == "__main__":
     raw_dir = os.path.join(base_dir, 'data', 'raw')
     processed_dir = os.path.join(base_dir, 'data', 'processed')
 
-    load_and_process_data(raw_dir, processed_dir)
+    parser = argparse.ArgumentParser(description="Clean raw WFDB records into X_data.npy / y_labels.pkl.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--channels-first", action="store_true", help="Store X as (N, 12, time) float32")
+    parser.add_argument("--fs", type=int, default=None,
+                        help=f"Storage sampling rate in Hz (default: the records' own rate); "
+                             f"ECGDataset resamples to {MODEL_FS} Hz on read")
+    args = parser.parse_args()
+
+    load_and_process_data(raw_dir, processed_dir, num_workers=args.workers, channels_first=args.channels_first,
+                          fs=args.fs)
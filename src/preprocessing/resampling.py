@@ -0,0 +1,144 @@
+import numpy as np
+from fractions import Fraction
+from functools import lru_cache
+from scipy import signal
+
+# Rate the model was trained at (PTB-XL records500); everything is brought here at ingest
+MODEL_FS = 500
+# resample_poly's own defaults: Kaiser window, 10 taps per phase on each side
+RESAMPLE_WINDOW = ('kaiser', 5.0)
+RESAMPLE_HALF_TAPS = 10
+
+def resample_ratio(fs_in, fs_out):
+    """
+    (up, down) integer factors for fs_in -> fs_out, e.g. 100 -> 500 is (5, 1).
+    """
+    ratio = Fraction(fs_out / fs_in).limit_denominator(1000)
+    return ratio.numerator, ratio.denominator
+
+@lru_cache(maxsize=None)
+def resample_filter(up, down):
+    """
+    Anti-aliasing FIR for an up/down polyphase resampler, designed once per ratio.
+    Identical to what resample_poly would design on every call.
+    """
+    max_rate = max(up, down)
+    taps = 2 * RESAMPLE_HALF_TAPS * max_rate + 1
+    h = signal.firwin(taps, 1.0 / max_rate, window=RESAMPLE_WINDOW)
+    h.setflags(write=False)
+    return h
+
+def resampled_length(n, fs_in, fs_out=MODEL_FS):
+    up, down = resample_ratio(fs_in, fs_out)
+    return -(-n * up // down)
+
+def resample(ecg_signal, fs_in, fs_out=MODEL_FS, axis=None):
+    """
+    Polyphase resampling of (time,), (time, channels) or (batch, time, channels)
+    input along the time axis. Returns the input unchanged when the rates match.
+    """
+    ecg_signal = np.asarray(ecg_signal)
+    up, down = resample_ratio(fs_in, fs_out)
+    if up == down:
+        return ecg_signal
+    if axis is None:
+        axis = 0 if ecg_signal.ndim == 1 else -2
+    # resample_poly copies (and scales) the coefficients it is given
+    return signal.resample_poly(ecg_signal, up, down, axis=axis, window=resample_filter(up, down))
+
+class StreamingResampler:
+    """
+    Polyphase resampling of a recording fed in (time, channels) chunks, with the
+    same output as resample(whole recording): only the filter's history is kept
+    between chunks, and outputs are emitted as soon as every input they depend on
+    has arrived. Call finish() after the last chunk for the remaining tail.
+    `channels` is only used for empty outputs before the first chunk sets it.
+    """
+    def __init__(self, fs_in, fs_out=MODEL_FS, channels=12):
+        self.up, self.down = resample_ratio(fs_in, fs_out)
+        self.channels = channels
+        self.reset()
+        if self.up == self.down:
+            return  # pass-through
+        h = resample_filter(self.up, self.down) * self.up
+        half_len = (len(h) - 1) // 2
+        # Same centering as resample_poly: pad the front so the delay is a whole output step
+        pre_pad = self.down - half_len % self.down
+        self.h = np.concatenate([np.zeros(pre_pad), h])
+        self.skip = (half_len + pre_pad) // self.down
+
+    def reset(self):
+        self.buffer = None  # input samples from absolute index self.start on
+        self.start = 0
+        self.received = 0
+        self.next_out = 0  # next absolute upfirdn output index
+
+    def _outputs(self, end):
+        # upfirdn outputs [next_out, end) of the whole stream, from the buffered tail
+        offset = self.start * self.up // self.down
+        z = signal.upfirdn(self.h, self.buffer, self.up, self.down, axis=0)
+        out = z[self.next_out - offset:end - offset]
+        # Outputs before `skip` are the filter delay resample_poly trims away
+        out = out[max(0, self.skip - self.next_out):]
+        self.next_out = end
+        # Keep only the inputs the next output still needs; the buffer start stays on
+        # a multiple of `down` so the output grid does not shift
+        first_needed = max(0, (self.next_out * self.down - len(self.h) + 1) // self.up)
+        first_needed -= first_needed % self.down
+        if first_needed > self.start:
+            self.buffer = self.buffer[first_needed - self.start:]
+            self.start = first_needed
+        return out
+
+    def process_chunk(self, chunk):
+        chunk = np.asarray(chunk, dtype=np.float64)
+        self.channels = chunk.shape[1]
+        if self.up == self.down:
+            return chunk
+        self.buffer = chunk if self.buffer is None else np.concatenate([self.buffer, chunk])
+        self.received += len(chunk)
+        # Output j reads up-sampled inputs up to j * down, which must have arrived
+        return self._outputs((self.received * self.up - 1) // self.down + 1)
+
+    def finish(self):
+        """
+        Remaining outputs, treating the signal as zero after the last sample.
+        """
+        if self.up == self.down or self.buffer is None:
+            return np.zeros((0, self.channels))
+        total = -(-self.received * self.up // self.down)
+        tail = np.zeros((len(self.h) // self.up + 1,) + self.buffer.shape[1:])
+        self.buffer = np.concatenate([self.buffer, tail])
+        return self._outputs(self.skip + total)
+
+class ECGSignal:
+    """
+    A recording with its sampling rate: data is (time, leads), fs in Hz.
+    """
+    def __init__(self, data, fs):
+        self.data = np.asarray(data)
+        self.fs = fs
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def duration(self):
+        return len(self.data) / self.fs
+
+    def time_axis(self):
+        return np.arange(len(self.data)) / self.fs
+
+    def resampled(self, fs=MODEL_FS):
+        if fs == self.fs:
+            return self
+        return ECGSignal(resample(self.data, self.fs, fs), fs)
+
+    def truncated(self, seconds):
+        return ECGSignal(self.data[:int(round(seconds * self.fs))], self.fs)
+
+def ingest(data, fs):
+    """
+    Wraps raw samples recorded at `fs` and brings them to the model's rate.
+    """
+    return ECGSignal(data, fs).resampled(MODEL_FS)
@@ -10,156 +10,511 @@ if project_root not in sys.path:
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import DataLoader, random_split
+from torch.utils.data import DataLoader
 import numpy as np
+import argparse
+import json
+import random
+import socket
 import time
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.nn.parallel import DistributedDataParallel as DDP
+from torch.utils.data.distributed import DistributedSampler
 
-from src.neural_network.dataset import ECGDataset, RandomNoise, RandomShift, Compose
+from src.neural_network.dataset import ECGDataset, ECGSubset, BatchAugment, BatchRandomNoise, BatchRandomShift
 from src.neural_network.model import CNNLSTM
+from src.modules.profiling import Profiler
+from src.neural_network.checkpoint import CheckpointManager, latest_checkpoint, load_checkpoint, capture_rng_state, restore_rng_state
 
-def train():
+# Training configuration. Override through train(**overrides), CLI flags or --config file.json
+DEFAULT_CONFIG = {
     # Hyperparameters
-    BATCH_SIZE = 32 # Increased for stability
-    LEARNING_RATE = 0.0005 # Lower learning rate for better convergence
-    EPOCHS = 50 # Increased epochs
-    PATIENCE = 8 # Increased patience
-    
+    'batch_size': 32, # Increased for stability
+    'learning_rate': 0.0005, # Lower learning rate for better convergence
+    'epochs': 50, # Increased epochs
+    'patience': 8, # Increased patience
+    'weight_decay': 1e-3, # AdamW weight decay
+    'dropout': 0.5, # LSTM inter-layer and classifier dropout
+    # Data pipeline
+    'num_workers': 0, # DataLoader worker processes (0 = load in the training process)
+    'prefetch_factor': 2, # Batches prefetched per worker
+    'persistent_workers': True, # Keep workers alive between epochs
+    'pin_memory': None, # None = pin only when training on CUDA
+    'seed': None, # Seeds shuffling, augmentation and worker RNGs
+    # Fast training
+    'precision': 'fp32', # 'bf16' = bfloat16 autocast for forward passes
+    'compile': False, # torch.compile the model
+    'save_model': True, # Write saved_model.pth and checkpoints
+    # Checkpointing
+    'checkpoint_dir': None, # None = <project>/checkpoints
+    'keep_checkpoints': 3, # Last K epoch checkpoints kept on disk (best.pt is kept separately)
+    'resume': None, # Checkpoint path, or 'latest'
+    # Profiling
+    'profile': False, # Per-stage timings, summary JSON in profile_dir
+    'profile_trace': False, # Also record a torch.profiler trace of a few training steps
+    'profile_dir': None, # None = <project>/profiles
+    # Distributed (CPU, gloo)
+    'world_size': 1, # Training processes; batch_size is per process
+    'threads_per_rank': None, # None = cores / world_size
+    'master_port': None, # None = pick a free local port
+    # Called as epoch_callback(epoch, val_loss) after each epoch; returning True stops the run (pruning)
+    'epoch_callback': None,
+}
+
+PRECISIONS = {'fp32': None, 'bf16': torch.bfloat16}
+
+def seed_worker(worker_id):
+    """
+    DataLoader worker_init_fn: derive numpy/random seeds from the worker's torch seed,
+    so workers never share an augmentation stream.
+    """
+    worker_seed = torch.initial_seed() % 2**32
+    np.random.seed(worker_seed)
+    random.seed(worker_seed)
+
+def build_loader(dataset, config, device, shuffle=False, collate_fn=None, generator=None, sampler=None):
+    num_workers = config['num_workers']
+    pin_memory = config['pin_memory'] if config['pin_memory'] is not None else device.type == 'cuda'
+    kwargs = dict(batch_size=config['batch_size'], shuffle=shuffle, num_workers=num_workers,
+                  pin_memory=pin_memory, collate_fn=collate_fn, generator=generator, sampler=sampler)
+    if num_workers > 0:
+        kwargs.update(worker_init_fn=seed_worker,
+                      prefetch_factor=config['prefetch_factor'],
+                      persistent_workers=config['persistent_workers'])
+    return DataLoader(dataset, **kwargs)
+
+def train(**overrides):
+    """
+    Trains CNNLSTM with DEFAULT_CONFIG updated by `overrides`; returns a run summary dict.
+    With world_size > 1, spawns that many CPU processes for data-parallel training.
+    """
+    config = dict(DEFAULT_CONFIG)
+    unknown = set(overrides) - set(config)
+    if unknown:
+        raise ValueError(f"Unknown training options: {sorted(unknown)}")
+    config.update(overrides)
+
+    if config['precision'] not in PRECISIONS:
+        raise ValueError(f"precision must be one of {sorted(PRECISIONS)}")
+    if config['keep_checkpoints'] < 1:
+        raise ValueError("keep_checkpoints must be at least 1")
+
+    world_size = config['world_size']
+    if world_size <= 1:
+        return _train(config)
+
+    if not os.path.exists(os.path.join(project_root, 'data', 'processed', 'X_data.npy')):
+        print("Data not found. Please run src/preprocessing/prepare_dataset.py first.")
+        return
+
+    if config['master_port'] is None:
+        config['master_port'] = _free_port()
+    ctx = mp.get_context('spawn')
+    results = ctx.SimpleQueue()
+    mp.spawn(_train_worker, args=(config, world_size, results, project_root), nprocs=world_size, join=True)
+    return results.get()
+
+def _train_worker(rank, config, world_size, results, root):
+    # Spawned processes re-import this module; keep the parent's project root
+    global project_root
+    project_root = root
+    _train(config, rank, world_size, results)
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _all_reduce_sum(values, world_size):
+    """
+    Sums a list of numbers across ranks (identity for a single process).
+    """
+    if world_size == 1:
+        return values
+    t = torch.tensor(values, dtype=torch.float64)
+    dist.all_reduce(t, op=dist.ReduceOp.SUM)
+    return t.tolist()
+
+def _train(config, rank=0, world_size=1, results=None):
+    distributed = world_size > 1
+    # Only rank 0 talks, saves and profiles
+    log = print if rank == 0 else (lambda *args, **kwargs: None)
+
+    if distributed:
+        # Split the box between ranks so they do not oversubscribe the cores
+        threads = config['threads_per_rank'] or max(1, (os.cpu_count() or 1) // world_size)
+        torch.set_num_threads(threads)
+        dist.init_process_group('gloo', init_method=f"tcp://127.0.0.1:{config['master_port']}",
+                                rank=rank, world_size=world_size)
+
+    # Hyperparameters
+    BATCH_SIZE = config['batch_size']
+    LEARNING_RATE = config['learning_rate']
+    EPOCHS = config['epochs']
+    PATIENCE = config['patience']
+
+    if config['seed'] is not None:
+        torch.manual_seed(config['seed'])
+        np.random.seed(config['seed'])
+        random.seed(config['seed'])
+
     # Paths
     base_dir = project_root
     processed_dir = os.path.join(base_dir, 'data', 'processed')
     data_path = os.path.join(processed_dir, 'X_data.npy')
     labels_path = os.path.join(processed_dir, 'y_labels.pkl')
-    
+
     if not os.path.exists(data_path):
-        print("Data not found. Please run src/preprocessing/prepare_dataset.py first.")
+        log("Data not found. Please run src/preprocessing/prepare_dataset.py first.")
         return
 
+    # Distributed mode is CPU-only (gloo)
+    device = torch.device("cuda" if torch.cuda.is_available() and not distributed else "cpu")
+
     # 1. Prepare Data
-    # Define data augmentation for training
-    train_transform = Compose([
-        RandomNoise(noise_level=0.05),
-        RandomShift(shift_max=50)
-    ])
-    
-    # Load dataset without transform initially
+    # Define data augmentation for training, applied once per batch in the collate step
+    train_augment = BatchAugment([
+        BatchRandomNoise(noise_level=0.05),
+        BatchRandomShift(shift_max=50)
+    ], seed=config['seed'] + rank if config['seed'] is not None else None)
+
+    # Load dataset once (memory-mapped); subsets share it and carry their own transforms
     full_dataset = ECGDataset(data_path, labels_path)
-    
+
     # Handle small datasets gracefully
     if len(full_dataset) < 10:
-        print("WARNING: Dataset is very small. Reducing batch size.")
-        BATCH_SIZE = 2
-        
+        log("WARNING: Dataset is very small. Reducing batch size.")
+        config['batch_size'] = BATCH_SIZE = 2
+
     train_size = int(0.8 * len(full_dataset))
     val_size = len(full_dataset) - train_size
-    
+
     # Split indices
     indices = list(range(len(full_dataset)))
     train_indices, val_indices = indices[:train_size], indices[train_size:]
-    
-    # Create subsets with appropriate transforms
-    train_dataset = torch.utils.data.Subset(ECGDataset(data_path, labels_path, transform=train_transform), train_indices)
-    val_dataset = torch.utils.data.Subset(ECGDataset(data_path, labels_path, transform=None), val_indices)
-    
-    train_loader = DataLoader(train_dataset, batch_size=BATCH_SIZE, shuffle=True, num_workers=0)
-    val_loader = DataLoader(val_dataset, batch_size=BATCH_SIZE, shuffle=False, num_workers=0)
-    
-    print(f"Training on {len(train_dataset)} samples, Validating on {len(val_dataset)} samples.")
+
+    # Create subsets (augmentation happens per batch in the train loader)
+    train_dataset = ECGSubset(full_dataset, train_indices)
+    val_dataset = ECGSubset(full_dataset, val_indices, transform=None)
+
+    shuffle_generator = None
+    if config['seed'] is not None:
+        shuffle_generator = torch.Generator()
+        shuffle_generator.manual_seed(config['seed'])
+    train_sampler = val_sampler = None
+    if distributed:
+        # Each rank reads its own shard of the memory-mapped dataset.
+        # The val shards are padded to equal size; losses are then averaged over all ranks.
+        train_sampler = DistributedSampler(train_dataset, num_replicas=world_size, rank=rank,
+                                           shuffle=True, seed=config['seed'] or 0)
+        val_sampler = DistributedSampler(val_dataset, num_replicas=world_size, rank=rank, shuffle=False)
+    train_loader = build_loader(train_dataset, config, device, shuffle=train_sampler is None, collate_fn=train_augment,
+                                generator=shuffle_generator, sampler=train_sampler)
+    val_loader = build_loader(val_dataset, config, device, shuffle=False, sampler=val_sampler)
+
+    log(f"Training on {len(train_dataset)} samples, Validating on {len(val_dataset)} samples.")
+    if distributed:
+        log(f"Distributed: {world_size} processes (gloo), {torch.get_num_threads()} thread(s) each, "
+            f"batch {BATCH_SIZE} per process")
+    log(f"Data loading: {config['num_workers']} worker(s), pin_memory={train_loader.pin_memory}")
 
     # 2. Initialize Model
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    print(f"Using device: {device}")
-    
-    model = CNNLSTM(input_channels=12, num_classes=1).to(device)
-    
+    log(f"Using device: {device}")
+
+    model = CNNLSTM(input_channels=12, num_classes=1, dropout=config['dropout']).to(device)
+    # Wrappers (DDP, compile) share parameters with `model`, which is what gets saved
+    step_model = DDP(model) if distributed else model
+    if config['compile']:
+        step_model = torch.compile(step_model)
+
+    # Mixed precision: autocast the forward pass only; the loss runs on float32 logits
+    autocast_dtype = PRECISIONS[config['precision']]
+    autocast = lambda: torch.autocast(device_type=device.type, dtype=autocast_dtype, enabled=autocast_dtype is not None)
+    if autocast_dtype is not None or config['compile']:
+        log(f"Fast training: precision={config['precision']}, compile={config['compile']}")
+
     # 3. Loss and Optimizer
-    criterion = nn.BCELoss()
+    # Loss on logits (Sigmoid folded in) is the numerically safe form under autocast
+    criterion = nn.BCEWithLogitsLoss()
     # AdamW adds weight decay for regularization
-    # Reverted weight decay to 1e-3 to allow model to learn stronger features
-    optimizer = optim.AdamW(model.parameters(), lr=LEARNING_RATE, weight_decay=1e-3)
-    
+    # Weight decay defaults to 1e-3 to allow model to learn stronger features
+    optimizer = optim.AdamW(model.parameters(), lr=LEARNING_RATE, weight_decay=config['weight_decay'])
+
     # Scheduler: Reduce LR if validation loss plateaus
     # Removed verbose=True for PyTorch 2.0+ compatibility
     scheduler = optim.lr_scheduler.ReduceLROnPlateau(optimizer, mode='min', factor=0.5, patience=3)
-    
+
     # 4. Training Loop with Early Stopping
     best_val_loss = float('inf')
     patience_counter = 0
-    
+    start_epoch = 0
+    non_blocking = train_loader.pin_memory
+
+    checkpoint_dir = config['checkpoint_dir'] or os.path.join(base_dir, 'checkpoints')
+    checkpoints = None
+    if config['save_model'] and rank == 0:
+        checkpoints = CheckpointManager(checkpoint_dir, keep_last=config['keep_checkpoints'])
+    model_save_path = os.path.join(base_dir, 'src', 'neural_network', 'saved_model.pth')
+
+    if config['resume']:
+        resume_path = config['resume']
+        if resume_path == 'latest':
+            resume_path = latest_checkpoint(checkpoint_dir)
+        if resume_path is None:
+            log("No checkpoint found, starting from scratch.")
+        else:
+            # RNG states must stay on the CPU; load_state_dict moves tensors to the model's device
+            state = load_checkpoint(resume_path, map_location='cpu')
+            model.load_state_dict(state['model'])
+            optimizer.load_state_dict(state['optimizer'])
+            scheduler.load_state_dict(state['scheduler'])
+            start_epoch = state['epoch'] + 1
+            best_val_loss = state['best_val_loss']
+            patience_counter = state['patience_counter']
+            # Saved RNG streams are rank 0's; other ranks keep their own
+            if rank == 0:
+                restore_rng_state(state['rng'])
+            if shuffle_generator is not None and state.get('shuffle_generator') is not None:
+                shuffle_generator.set_state(state['shuffle_generator'])
+            if state.get('augment_generator') is not None and rank == 0:
+                train_augment.generator().set_state(state['augment_generator'])
+            log(f"Resumed from {resume_path} at epoch {start_epoch + 1} (best Val Loss: {best_val_loss:.4f})")
+            if patience_counter >= PATIENCE:
+                log("Checkpoint had already triggered early stopping.")
+                start_epoch = EPOCHS
+
+    profiler = Profiler(enabled=config['profile'] and rank == 0,
+                        trace_dir=os.path.join(config['profile_dir'] or os.path.join(base_dir, 'profiles'), 'traces')
+                        if config['profile_trace'] else None)
+    profiler.start_trace()
+
     start_time = time.time()
-    
-    for epoch in range(EPOCHS):
+    samples_seen = 0
+    train_compute = 0.0
+    val_epoch_loss = float('nan')
+    epoch = start_epoch - 1
+    pruned = False
+
+    for epoch in range(start_epoch, EPOCHS):
+        if train_sampler is not None:
+            train_sampler.set_epoch(epoch)
         model.train()
         running_loss = 0.0
         correct = 0
         total = 0
-        
+        # Time blocked waiting on the loader vs. time spent on the training step
+        data_wait = 0.0
+        step_time = 0.0
+
+        t_ready = time.perf_counter()
         for inputs, labels in train_loader:
-            inputs, labels = inputs.to(device), labels.to(device)
-            labels = labels.unsqueeze(1)
-            
+            t_batch = time.perf_counter()
+            data_wait += t_batch - t_ready
+            profiler.add('data_load', t_batch - t_ready)
+
+            with profiler.stage('h2d'):
+                inputs, labels = inputs.to(device, non_blocking=non_blocking), labels.to(device, non_blocking=non_blocking)
+                labels = labels.unsqueeze(1)
+
             optimizer.zero_grad()
-            outputs = model(inputs)
-            loss = criterion(outputs, labels)
-            loss.backward()
-            
-            # Gradient clipping to prevent exploding gradients in LSTM
-            torch.nn.utils.clip_grad_norm_(model.parameters(), max_norm=1.0)
-            
-            optimizer.step()
-            
+            with profiler.stage('forward'):
+                with autocast():
+                    logits = step_model(inputs, return_logits=True)
+                loss = criterion(logits.float(), labels)
+            with profiler.stage('backward'):
+                loss.backward()
+
+            with profiler.stage('optimizer'):
+                # Gradient clipping to prevent exploding gradients in LSTM
+                torch.nn.utils.clip_grad_norm_(model.parameters(), max_norm=1.0)
+                optimizer.step()
+
             running_loss += loss.item()
-            predicted = (outputs > 0.5).float()
+            predicted = (logits > 0).float()
             total += labels.size(0)
             correct += (predicted == labels).sum().item()
-            
-        epoch_loss = running_loss / len(train_loader)
+
+            profiler.step()
+            t_ready = time.perf_counter()
+            step_time += t_ready - t_batch
+
+        running_loss, train_batches, correct, total = _all_reduce_sum(
+            [running_loss, len(train_loader), correct, total], world_size)
+
+        # The first epoch carries compilation / warm-up; keep it out of throughput when possible
+        if epoch == start_epoch + 1:
+            samples_seen, train_compute = 0, 0.0
+        samples_seen += total
+        train_compute += data_wait + step_time
+        epoch_loss = running_loss / train_batches
         epoch_acc = 100 * correct / total if total > 0 else 0
-        
+
         # Validation
         model.eval()
         val_loss = 0.0
         val_correct = 0
         val_total = 0
-        
-        with torch.no_grad():
+
+        with torch.no_grad(), profiler.stage('validation'):
             for inputs, labels in val_loader:
-                inputs, labels = inputs.to(device), labels.to(device)
+                inputs, labels = inputs.to(device, non_blocking=non_blocking), labels.to(device, non_blocking=non_blocking)
                 labels = labels.unsqueeze(1)
-                
-                outputs = model(inputs)
-                loss = criterion(outputs, labels)
+
+                with autocast():
+                    logits = step_model(inputs, return_logits=True)
+                loss = criterion(logits.float(), labels)
                 val_loss += loss.item()
-                
-                predicted = (outputs > 0.5).float()
+
+                predicted = (logits > 0).float()
                 val_total += labels.size(0)
                 val_correct += (predicted == labels).sum().item()
-        
-        val_epoch_loss = val_loss / len(val_loader) if len(val_loader) > 0 else 0
+
+        # Every rank ends up with the same val loss, so scheduler and early stopping stay in sync
+        val_loss, val_batches, val_correct, val_total = _all_reduce_sum(
+            [val_loss, len(val_loader), val_correct, val_total], world_size)
+        val_epoch_loss = val_loss / val_batches if val_batches > 0 else 0
         val_acc = 100 * val_correct / val_total if val_total > 0 else 0
-        
+
         # Step Scheduler
         scheduler.step(val_epoch_loss)
-        
-        print(f"Epoch [{epoch+1}/{EPOCHS}] "
+
+        log(f"Epoch [{epoch+1}/{EPOCHS}] "
               f"Train Loss: {epoch_loss:.4f} Acc: {epoch_acc:.2f}% | "
-              f"Val Loss: {val_epoch_loss:.4f} Acc: {val_acc:.2f}%")
-        
+              f"Val Loss: {val_epoch_loss:.4f} Acc: {val_acc:.2f}% | "
+              f"Data wait: {data_wait:.1f}s Step: {step_time:.1f}s")
+
         # Early Stopping & Model Checkpoint
-        if val_epoch_loss < best_val_loss:
+        is_best = val_epoch_loss < best_val_loss
+        if is_best:
             best_val_loss = val_epoch_loss
             patience_counter = 0
-            # Save best model
-            model_save_path = os.path.join(base_dir, 'src', 'neural_network', 'saved_model.pth')
-            torch.save(model.state_dict(), model_save_path)
-            print(f"--> Best model saved (Val Loss: {val_epoch_loss:.4f})")
         else:
             patience_counter += 1
-            if patience_counter >= PATIENCE:
-                print("Early stopping triggered.")
-                break
+
+        # Full training state, written in the background (best model also exported to saved_model.pth)
+        if checkpoints is not None:
+            checkpoints.save({
+                'epoch': epoch,
+                'model': model.state_dict(),
+                'optimizer': optimizer.state_dict(),
+                'scheduler': scheduler.state_dict(),
+                'best_val_loss': best_val_loss,
+                'patience_counter': patience_counter,
+                'config': {k: v for k, v in config.items() if k != 'epoch_callback'},
+                'rng': capture_rng_state(),
+                'shuffle_generator': shuffle_generator.get_state() if shuffle_generator is not None else None,
+                'augment_generator': train_augment.generator().get_state(),
+            }, epoch, is_best=is_best, export_path=model_save_path)
+            if is_best:
+                log(f"--> Best model saved (Val Loss: {val_epoch_loss:.4f})")
+
+        if patience_counter >= PATIENCE:
+            log("Early stopping triggered.")
+            break
+
+        if config['epoch_callback'] is not None and config['epoch_callback'](epoch, val_epoch_loss):
+            log("Run pruned.")
+            pruned = True
+            break
+
+    if checkpoints is not None:
+        checkpoints.close()
 
     total_time = time.time() - start_time
-    print(f"Training complete in {total_time:.0f}s. Best Val Loss: {best_val_loss:.4f}")
+    log(f"Training complete in {total_time:.0f}s. Best Val Loss: {best_val_loss:.4f}")
+
+    profiler.stop_trace()
+    profiler.report()
+    profiler.write('train', config['profile_dir'] or os.path.join(base_dir, 'profiles'),
+                   config=config, epochs=epoch + 1, best_val_loss=best_val_loss)
+
+    if distributed:
+        dist.destroy_process_group()
+
+    summary = {
+        'epochs': epoch + 1,
+        'pruned': pruned,
+        'best_val_loss': best_val_loss,
+        'final_val_loss': val_epoch_loss,
+        'train_time': total_time,
+        # Throughput of the training passes (loader wait included, validation excluded)
+        'samples_per_sec': samples_seen / train_compute if train_compute > 0 else 0.0,
+    }
+    if results is not None and rank == 0:
+        results.put(summary)
+    return summary
+
+def benchmark(epochs=3, **overrides):
+    """
+    Trains the fp32 eager baseline and the fast mode (bf16 autocast + torch.compile)
+    for the same epochs and seed, and reports throughput and final validation loss.
+    """
+    base = dict(overrides, epochs=epochs, patience=epochs, save_model=False)
+    base.setdefault('seed', 0)
+    runs = {
+        'baseline': dict(base, precision='fp32', compile=False),
+        'fast': dict(base, precision=overrides.get('precision', 'bf16'), compile=overrides.get('compile', True)),
+    }
+    results = {}
+    for name, config in runs.items():
+        print(f"\n=== Benchmark: {name} ===")
+        results[name] = train(**config)
+        if results[name] is None:
+            return None
+
+    print("\nRun        samples/sec   final val loss")
+    for name, r in results.items():
+        print(f"{name:<10} {r['samples_per_sec']:>11.1f}   {r['final_val_loss']:.4f}")
+    speedup = results['fast']['samples_per_sec'] / max(results['baseline']['samples_per_sec'], 1e-9)
+    print(f"Speedup: {speedup:.2f}x")
+    results['speedup'] = speedup
+    return results
+
+def parse_args(argv=None):
+    """
+    Builds the training config: defaults < --config JSON file < explicit CLI flags.
+    """
+    parser = argparse.ArgumentParser(description="Train the CNN-LSTM MI detector.")
+    parser.add_argument("--config", help="JSON file with training options")
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument("--learning-rate", type=float)
+    parser.add_argument("--epochs", type=int)
+    parser.add_argument("--patience", type=int)
+    parser.add_argument("--weight-decay", type=float)
+    parser.add_argument("--dropout", type=float)
+    parser.add_argument("--num-workers", type=int)
+    parser.add_argument("--prefetch-factor", type=int)
+    parser.add_argument("--persistent-workers", action=argparse.BooleanOptionalAction, default=None)
+    parser.add_argument("--pin-memory", action=argparse.BooleanOptionalAction, default=None)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--precision", choices=sorted(PRECISIONS))
+    parser.add_argument("--compile", action=argparse.BooleanOptionalAction, default=None)
+    parser.add_argument("--save-model", action=argparse.BooleanOptionalAction, default=None)
+    parser.add_argument("--checkpoint-dir")
+    parser.add_argument("--keep-checkpoints", type=int)
+    parser.add_argument("--resume", nargs="?", const="latest",
+                        help="Resume from a checkpoint (default: the latest in --checkpoint-dir)")
+    parser.add_argument("--profile", action="store_true", default=None, help="Record per-stage timings")
+    parser.add_argument("--profile-trace", action="store_true", default=None, help="Also capture a torch.profiler trace")
+    parser.add_argument("--profile-dir")
+    parser.add_argument("--world-size", type=int, help="Data-parallel CPU processes (gloo)")
+    parser.add_argument("--threads-per-rank", type=int)
+    parser.add_argument("--benchmark", action="store_true", help="Compare fp32 eager vs. fast mode and exit")
+    args = parser.parse_args(argv)
+
+    config = {}
+    if args.config:
+        with open(args.config) as f:
+            config.update(json.load(f))
+    for key, value in vars(args).items():
+        if key not in ('config', 'benchmark') and value is not None:
+            config[key] = value
+    return config, args.benchmark
 
 if __name__ == "__main__":
-    train()
+    config, run_benchmark = parse_args()
+    if run_benchmark:
+        benchmark(**config)
+    else:
+        train(**config)
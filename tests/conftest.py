@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Add project root to sys.path to allow imports from src
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
@@ -0,0 +1,19 @@
+import numpy as np
+import torch
+
+from src.neural_network.model import CNNLSTM
+from src.modules.ecg_processor import generate_advanced_ecg, predict_risk, predict_risk_batch
+
+def test_predict_risk_batch_matches_predict_risk():
+    torch.manual_seed(0)
+    model = CNNLSTM(input_channels=12, num_classes=1).eval()
+    np.random.seed(0)
+    signals = [generate_advanced_ecg(heart_rate=hr, st_displacement=st)[0]
+               for hr, st in ((60, 0.0), (95, 0.15), (120, -0.1), (48, 0.3))]
+    # Ragged lengths (masked padding path) and a flat record with no beats
+    signals.append(generate_advanced_ecg(duration=6, heart_rate=80)[0])
+    signals.append(np.zeros((5000, 12)))
+
+    batched = predict_risk_batch(model, signals, batch_size=4)
+    expected = [predict_risk(model, s) for s in signals]
+    np.testing.assert_allclose(batched, expected, rtol=0, atol=1e-6)
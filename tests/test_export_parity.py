@@ -0,0 +1,28 @@
+import pytest
+import torch
+
+from src.neural_network.model import CNNLSTM
+from src.neural_network.fusion import fuse_model
+from src.neural_network.runtime import OnnxModel, check_parity, PARITY_ATOL
+from src.export_model import export_torchscript, export_onnx, EXAMPLE_SHAPE
+
+SHAPES = ((1, 12, 5000), (4, 12, 5000), (2, 12, 3000))
+
+@pytest.fixture(scope='module')
+def models():
+    torch.manual_seed(0)
+    eager = CNNLSTM(input_channels=12, num_classes=1).eval()
+    # Exports start from the folded model, as in export_model.export
+    return eager, fuse_model(eager)
+
+def test_torchscript_matches_eager(models, tmp_path):
+    eager, fused = models
+    path = export_torchscript(fused, str(tmp_path / 'model.ts.pt'), torch.randn(*EXAMPLE_SHAPE))
+    scripted = torch.jit.load(path).eval()
+    assert check_parity(eager, scripted, shapes=SHAPES) <= PARITY_ATOL
+
+def test_onnx_matches_eager(models, tmp_path):
+    pytest.importorskip('onnxruntime')
+    eager, fused = models
+    path = export_onnx(fused, str(tmp_path / 'model.onnx'), torch.randn(*EXAMPLE_SHAPE))
+    assert check_parity(eager, OnnxModel(path), shapes=SHAPES) <= PARITY_ATOL
@@ -0,0 +1,45 @@
+import copy
+import pytest
+import torch
+import torch.nn as nn
+
+from src.neural_network.model import CNNLSTM
+from src.neural_network.fusion import fuse_model
+
+ATOL = 1e-4
+
+@pytest.fixture
+def model():
+    torch.manual_seed(0)
+    model = CNNLSTM(input_channels=12, num_classes=1).eval()
+    # Non-trivial BN statistics and affine, so folding actually changes the conv weights
+    with torch.no_grad():
+        for bn in model.modules():
+            if isinstance(bn, nn.BatchNorm1d):
+                bn.running_mean.uniform_(-0.5, 0.5)
+                bn.running_var.uniform_(0.5, 2.0)
+                bn.weight.uniform_(0.5, 1.5)
+                bn.bias.uniform_(-0.2, 0.2)
+    return model
+
+def _logits(model, x, lengths=None):
+    with torch.inference_mode():
+        return model(x, return_logits=True, lengths=lengths)
+
+@pytest.mark.parametrize('copy_model', [True, False])
+def test_fused_matches_unfused(model, copy_model):
+    reference = copy.deepcopy(model)
+    fused = fuse_model(model, copy=copy_model)
+    assert not any(isinstance(m, nn.BatchNorm1d) for m in fused.modules())
+    # copy=True leaves the input untouched, copy=False folds it in place
+    assert (fused is model) != copy_model
+
+    generator = torch.Generator().manual_seed(1)
+    x = torch.randn(3, 12, 5000, generator=generator)
+    assert torch.allclose(_logits(reference, x), _logits(fused, x), atol=ATOL)
+
+    # Ragged batch: zero-padded items with their valid lengths
+    lengths = torch.tensor([5000, 3700, 2100])
+    steps = torch.arange(x.shape[-1])
+    padded = x * (steps < lengths.unsqueeze(1)).unsqueeze(1)
+    assert torch.allclose(_logits(reference, padded, lengths), _logits(fused, padded, lengths), atol=ATOL)
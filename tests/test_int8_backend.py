@@ -0,0 +1,26 @@
+import torch
+
+from src.neural_network.model import CNNLSTM
+from src.neural_network.runtime import artifact_paths, load_backend
+from src.quantize_model import quantize, save_quantized
+from src.modules.ecg_processor import generate_advanced_ecg, compute_saliency, compute_attributions_batch
+
+def _int8_backend(tmp_path):
+    torch.manual_seed(0)
+    model = CNNLSTM(input_channels=12, num_classes=1).eval()
+    weights_path = str(tmp_path / 'saved_model.pth')
+    torch.save(model.state_dict(), weights_path)
+    calibration = [torch.randn(2, 12, 5000) for _ in range(2)]
+    int8_model = quantize(model, calibration, mode='static')
+    save_quantized(int8_model, artifact_paths(weights_path)['int8'], calibration[0][:1])
+    return load_backend('int8', weights_path)
+
+def test_int8_attributions_unavailable(tmp_path):
+    model = _int8_backend(tmp_path)
+    assert model.supports_grad is False
+    # The INT8 kernels have no autograd: attributions come back as "unavailable" instead of raising
+    signal, _ = generate_advanced_ecg()
+    assert compute_saliency(model, signal) is None
+    assert compute_attributions_batch(model, [signal]) == [None]
+    with torch.inference_mode():
+        assert model(torch.randn(1, 12, 5000)).shape == (1, 1)
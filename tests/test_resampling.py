@@ -0,0 +1,13 @@
+import numpy as np
+import pytest
+
+from src.preprocessing.resampling import StreamingResampler, resample
+
+@pytest.mark.parametrize('fs', [500, 250, 100])
+def test_streaming_matches_whole_record(fs):
+    x = np.random.default_rng(0).standard_normal((3000, 3))
+    resampler = StreamingResampler(fs)
+    chunks = [resampler.process_chunk(c) for c in np.array_split(x, 7)]
+    # finish() is (time, channels) in every mode, including the 500 Hz pass-through
+    streamed = np.concatenate(chunks + [resampler.finish()])
+    np.testing.assert_array_equal(streamed, resample(x, fs))